@@ -10,10 +10,10 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
-import copy
-import json
-
-import uritemplate
+# jsonhome is imported by short lived command line tools and handlers so
+# anything that isn't needed to define the classes here is imported when
+# it is first used rather than up front.
+from jsonhome import _template
 
 
 __all__ = ['Document',
@@ -24,12 +24,21 @@ __all__ = ['Document',
            'JsonHomeException',
            'MissingValues',
            'UnknownResource',
-           'ResourceAlreadyExists'
+           'ResourceAlreadyExists',
+           'ReadOnly',
+           'MethodNotAllowed',
+           'UnsupportedMediaType',
+           'RangeNotSupported'
            ]
 
 
 MEDIA_TYPE = 'application/json-home'
 
+try:
+    _string_types = basestring  # noqa
+except NameError:  # python 3
+    _string_types = str
+
 
 class JsonHomeException(Exception):
     """Base Exception class that all JSONHome exceptions inherit from."""
@@ -47,6 +56,352 @@ class ResourceAlreadyExists(JsonHomeException):
     """A resource with the specified relation already exists."""
 
 
+class ReadOnly(JsonHomeException):
+    """The resource has been published and can no longer be modified."""
+
+
+class MethodNotAllowed(JsonHomeException):
+    """The resource hints do not allow the requested HTTP method."""
+
+
+class UnsupportedMediaType(JsonHomeException):
+    """The resource hints do not accept the request's content type."""
+
+
+class RangeNotSupported(JsonHomeException):
+    """The resource hints do not accept the requested range unit."""
+
+
+class _CacheInfo(tuple):
+    """Cache statistics, like functools.lru_cache's cache_info."""
+
+    __slots__ = ()
+
+    def __new__(cls, hits, misses, maxsize, currsize):
+        return super(_CacheInfo, cls).__new__(cls, (hits, misses,
+                                                    maxsize, currsize))
+
+    def __repr__(self):
+        return 'CacheInfo(hits=%d, misses=%d, maxsize=%d, currsize=%d)' % self
+
+    hits = property(lambda self: self[0])
+    misses = property(lambda self: self[1])
+    maxsize = property(lambda self: self[2])
+    currsize = property(lambda self: self[3])
+
+
+class _LRUCache(object):
+    """A bounded mapping that discards the least recently used entries.
+
+    Every value is stored along with the object it was derived from and the
+    version of that object at the time. A value is only returned while its
+    source is the same object at the same version.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+        import collections
+        self._data = collections.OrderedDict()
+
+    def get(self, key, source, version):
+        """Fetch the value for key if it is still valid for source.
+
+        A value that is no longer valid is dropped and counted as a miss.
+
+        :raises KeyError: if there is no valid value for key.
+        """
+        try:
+            entry = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            raise
+
+        if entry[0] is not source or entry[1] != version:
+            self.misses += 1
+            raise KeyError(key)
+
+        self._data[key] = entry
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key, source, version, value):
+        self._data[key] = (source, version, value)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def info(self):
+        return _CacheInfo(self.hits, self.misses, self.maxsize,
+                          len(self._data))
+
+
+class _SharedOwner(object):
+    """The owner of containers that are shared between resources.
+
+    Shared containers are read-only. Resources replace them with their own
+    copy before they hand them out through a property, see
+    :py:meth:`Resource._unshare_hints`.
+    """
+
+    def _invalidate(self):
+        raise ReadOnly('Shared hints can only be modified through the '
+                       'properties of a resource')
+
+
+_SHARED = _SharedOwner()
+
+
+def _track(value, owner):
+    """Wrap containers so that modifying them invalidates their owner.
+
+    Containers that are already tracked for the owner, or are shared, are
+    returned as is, anything else is copied into a new tracked container.
+    """
+    if type(value) in (_TrackedDict, _TrackedList):
+        if value._owner is owner or value._owner is _SHARED:
+            return value
+
+    # the containers are copied without calling back into python, only the
+    # nested containers then need to be replaced.
+    if isinstance(value, dict):
+        tracked = _TrackedDict(value)
+        tracked._owner = owner
+
+        for key, item in dict.items(tracked):
+            if isinstance(item, (dict, list)):
+                dict.__setitem__(tracked, key, _track(item, owner))
+
+    elif isinstance(value, list):
+        tracked = _TrackedList(value)
+        tracked._owner = owner
+
+        for i, item in enumerate(tracked):
+            if isinstance(item, (dict, list)):
+                list.__setitem__(tracked, i, _track(item, owner))
+
+    else:
+        return value
+
+    return tracked
+
+
+def _is_shared(value):
+    if type(value) not in (_TrackedDict, _TrackedList):
+        return False
+
+    return value._owner is _SHARED
+
+
+def _untracked(value):
+    """Make a plain copy of any tracked or shared containers in value."""
+    if type(value) is _TrackedDict:
+        return dict((k, _untracked(v)) for k, v in dict.items(value))
+
+    if type(value) is _TrackedList:
+        return [_untracked(v) for v in value]
+
+    return value
+
+
+def _share(value, pool):
+    """Fetch the shared equivalent of a JSON value.
+
+    Equal values loaded with the same pool are the same object. Strings are
+    shared as they are, containers are replaced by read-only shared
+    containers.
+
+    :param dict pool: The values that can be shared.
+
+    :returns: A tuple of the shared value and a key identifying it, or the
+        original value and None if it can't be shared.
+    """
+    if isinstance(value, _string_types):
+        return pool.setdefault(value, value), value
+
+    if value is None or isinstance(value, (bool, int, float)):
+        return value, (type(value), value)
+
+    if isinstance(value, dict):
+        if not all(isinstance(k, _string_types) for k in value):
+            return value, None
+
+        items = []
+
+        for k in sorted(value):
+            v, item_key = _share(value[k], pool)
+            if item_key is None:
+                return value, None
+            items.append((pool.setdefault(k, k), v, item_key))
+
+        key = (dict, tuple((k, item_key) for k, _, item_key in items))
+
+        try:
+            return pool[key], key
+        except KeyError:
+            shared = _track(dict((k, v) for k, v, _ in items), _SHARED)
+
+    elif isinstance(value, list):
+        items = [_share(v, pool) for v in value]
+
+        if any(item_key is None for _, item_key in items):
+            return value, None
+
+        key = (list, tuple(item_key for _, item_key in items))
+
+        try:
+            return pool[key], key
+        except KeyError:
+            shared = _track([v for v, _ in items], _SHARED)
+
+    else:
+        return value, None
+
+    pool[key] = shared
+    return shared, key
+
+
+class _TrackedDict(dict):
+    """A dict nested within a resource, like the hints."""
+
+    __slots__ = ('_owner',)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+    def __setitem__(self, key, value):
+        self._owner._invalidate()
+        super(_TrackedDict, self).__setitem__(key, _track(value, self._owner))
+
+    def __delitem__(self, key):
+        self._owner._invalidate()
+        super(_TrackedDict, self).__delitem__(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        self._owner._invalidate()
+        super(_TrackedDict, self).clear()
+
+    def pop(self, *args):
+        self._owner._invalidate()
+        return super(_TrackedDict, self).pop(*args)
+
+    def popitem(self):
+        self._owner._invalidate()
+        return super(_TrackedDict, self).popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        self._owner._invalidate()
+        for key, value in dict(*args, **kwargs).items():
+            dict.__setitem__(self, key, _track(value, self._owner))
+
+
+class _TrackedList(list):
+    """A list nested within a resource, like the allowed methods."""
+
+    __slots__ = ('_owner',)
+
+    def __reduce__(self):
+        return (list, (list(self),))
+
+    def _modify(name):
+        method = getattr(list, name)
+
+        def _modify(self, *args, **kwargs):
+            self._owner._invalidate()
+            return method(self, *args, **kwargs)
+
+        _modify.__name__ = name
+        return _modify
+
+    __delitem__ = _modify('__delitem__')
+    __imul__ = _modify('__imul__')
+    pop = _modify('pop')
+    remove = _modify('remove')
+    reverse = _modify('reverse')
+    sort = _modify('sort')
+
+    if hasattr(list, '__delslice__'):  # python 2
+        __delslice__ = _modify('__delslice__')
+
+    del _modify
+
+    def __setitem__(self, index, value):
+        self._owner._invalidate()
+
+        if isinstance(index, slice):
+            value = [_track(v, self._owner) for v in value]
+        else:
+            value = _track(value, self._owner)
+
+        super(_TrackedList, self).__setitem__(index, value)
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    def append(self, value):
+        self._owner._invalidate()
+        super(_TrackedList, self).append(_track(value, self._owner))
+
+    def clear(self):
+        self._owner._invalidate()
+        del self[:]
+
+    def extend(self, values):
+        self._owner._invalidate()
+        super(_TrackedList, self).extend(_track(v, self._owner)
+                                         for v in values)
+
+    def insert(self, index, value):
+        self._owner._invalidate()
+        super(_TrackedList, self).insert(index, _track(value, self._owner))
+
+
+def _urljoin(base, uri):
+    try:
+        from urllib import parse as urlparse
+    except ImportError:  # python 2
+        import urlparse
+
+    return urlparse.urljoin(base, uri)
+
+
+def _stable_hash(string):
+    """Hash a string the same way in every process.
+
+    Unlike the randomized builtin string hash the result can be used to
+    order or place relations consistently across processes.
+    """
+    import zlib
+
+    return zlib.crc32(string.encode('utf-8')) & 0xffffffff
+
+
+def _has_dot_segments(uri):
+    """Check if the path of a relative reference has . or .. segments."""
+    if '.' not in uri:
+        return False
+
+    for delimiter in '?#':
+        uri = uri.split(delimiter, 1)[0]
+
+    return any(segment in ('.', '..') for segment in uri.split('/'))
+
+
 def _allow_prop(method):
 
     def _allow_getter(self):
@@ -90,10 +445,33 @@ def _item_prop(name, default=None, setdefault=None, hint=False):
         return self.hints if hint else self
 
     def _getter(self):
-        if setdefault:
-            return o(self).setdefault(name, setdefault())
+        # look the value up without creating the hints so that reading a
+        # value that is present never modifies the resource.
+        container = dict.get(self, 'hints') if hint else self
+
+        try:
+            value = container[name]
+        except (KeyError, TypeError):
+            pass
         else:
-            return o(self).get(name, default)
+            # fetching the hints tracks them, and copies them if they are
+            # shared, so that modifying the value only affects this resource.
+            if hint and isinstance(value, (dict, list)):
+                value = self['hints'][name]
+
+            return value
+
+        if not setdefault:
+            return default
+
+        container = o(self)
+
+        # a read-only resource can't store the default. It is still tracked
+        # so that modifying it raises rather than being silently lost.
+        if self._frozen:
+            return _track(setdefault(), self)
+
+        return container.setdefault(name, setdefault())
 
     def _setter(self, value):
         o(self)[name] = value
@@ -104,9 +482,386 @@ def _item_prop(name, default=None, setdefault=None, hint=False):
     return property(_getter, _setter, _deleter)
 
 
+def _iter_resources(items, kwargs, cache=True):
+    """Serialize (relation, resource) pairs as a json-home document.
+
+    The output joined together is identical to json.dumps of the equivalent
+    document. It is produced one resource at a time from the serialized form
+    cached on each resource.
+
+    :param items: The (relation, resource) pairs to serialize.
+    :param dict kwargs: Arguments as accepted by :py:func:`json.dumps`.
+    :param bool cache: Store the serialized form of resources that are not
+        already cached. If False then at most one resource that wasn't cached
+        is held in memory at a time.
+
+    :returns: An iterator of strings.
+    """
+    items = list(items)
+
+    import json
+
+    if 'cls' in kwargs or not all(isinstance(relation, _string_types)
+                                  for relation, _ in items):
+        cls = kwargs.get('cls') or json.JSONEncoder
+        options = dict((k, v) for k, v in kwargs.items() if k != 'cls')
+
+        for chunk in cls(**options).iterencode({'resources': dict(items)}):
+            yield chunk
+
+        return
+
+    encoder = json.JSONEncoder(**kwargs)
+
+    try:
+        options = tuple(sorted(kwargs.items()))
+        hash(options)
+    except TypeError:
+        options = None
+
+    indent = encoder.indent
+    if indent is not None and not isinstance(indent, _string_types):
+        indent = ' ' * indent
+
+    def render(resource):
+        data = encoder.encode(resource)
+        if indent:
+            data = data.replace('\n', '\n' + indent * 2)
+        return data
+
+    if encoder.sort_keys:
+        items.sort(key=lambda item: item[0])
+
+    name = encoder.encode('resources') + encoder.key_separator
+
+    if not items:
+        if indent is None:
+            yield '{%s{}}' % name
+        else:
+            yield '{\n%s%s{}\n}' % (indent, name)
+        return
+
+    if indent is None:
+        yield '{%s{' % name
+        separator = encoder.item_separator
+    else:
+        yield '{\n%s%s{\n%s' % (indent, name, indent * 2)
+        separator = encoder.item_separator + '\n' + indent * 2
+
+    for i, (relation, resource) in enumerate(items):
+        if options is None or not isinstance(resource, Resource):
+            data = render(resource)
+        elif cache:
+            data = resource._cached_json(options, render)
+        else:
+            data = (resource._json_cache or {}).get(options)
+            data = data or render(resource)
+
+        yield '%s%s%s%s' % (separator if i else '',
+                            encoder.encode(relation),
+                            encoder.key_separator,
+                            data)
+
+    if indent is None:
+        yield '}}'
+    else:
+        yield '\n%s}\n}' % indent
+
+
+def _dump_resources(items, kwargs):
+    """Serialize (relation, resource) pairs as a json-home document.
+
+    See :py:func:`_iter_resources`.
+
+    :rtype: str
+    """
+    return ''.join(_iter_resources(items, kwargs))
+
+
+def _fingerprint(resource):
+    import hashlib
+    import json
+
+    data = json.dumps(resource, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+# hint: header, in the order they are sent.
+_HINT_HEADERS = (('allow', 'Allow'),
+                 ('accept-patch', 'Accept-Patch'),
+                 ('accept-post', 'Accept-Post'),
+                 ('accept-ranges', 'Accept-Ranges'))
+
+
+def _build_headers(resource):
+    hints = dict.get(resource, 'hints') or {}
+    headers = []
+
+    for hint, header in _HINT_HEADERS:
+        values = hints.get(hint)
+
+        # an empty Allow header means no methods are allowed, the others
+        # are only meaningful with a value.
+        if values or (values is not None and hint == 'allow'):
+            headers.append((header, ', '.join(values)))
+
+    docs = hints.get('docs')
+    if docs:
+        headers.append(('Link', '<%s>; rel="describedby"' % docs))
+
+    return tuple(headers)
+
+
+def _share_resource_hints(data, pool):
+    hints = data.get('hints') if isinstance(data, dict) else None
+
+    if not isinstance(hints, dict):
+        return data
+
+    # the repr finds hints that were most likely written the same way
+    # without walking them in python. Comparing them rules out the rare
+    # values that are different but have the same repr, and hints written
+    # in a different order are only shared less.
+    key = ('hints', repr(hints))
+    shared = pool.get(key)
+
+    if shared is None:
+        shared, share_key = _share(hints, pool)
+
+        if share_key is None:
+            return data
+
+        pool[key] = shared
+
+    elif shared != hints:
+        return data
+
+    data = dict(data)
+    data['hints'] = shared
+    return data
+
+
 class Resource(dict):
     """One resource that exists within a JSON home document."""
 
+    _frozen = False
+    _version = 0
+
+    # values derived from the resource contents are only created when they
+    # are first needed, most resources that are loaded are never used.
+    _uri_cache = None
+    _json_cache = None
+    _headers = None
+    _compiled_template = None
+    _documents = None
+
+    def __reduce__(self):
+        # only the resource data should be copied or pickled, never the
+        # values that have been derived from it.
+        data = dict((k, _untracked(v)) for k, v in dict.items(self))
+        return (self.__class__, (data,))
+
+    def _invalidate(self):
+        """Discard everything that was derived from the resource contents.
+
+        This must be called before any modification of the resource data.
+
+        :raises jsonhome.ReadOnly: if the resource has been frozen.
+        """
+        if self._frozen:
+            raise ReadOnly('The resource has been published and is read-only')
+
+        self._version += 1
+        self._uri_cache = None
+        self._json_cache = None
+        self._headers = None
+
+        documents = self._documents
+
+        if documents is None:
+            return
+
+        if not isinstance(documents, dict):
+            document = documents()
+
+            if document is None:
+                self._documents = None
+            else:
+                document._changed(resource=self)
+
+            return
+
+        for key, ref in list(documents.items()):
+            document = ref()
+
+            if document is None:
+                del documents[key]
+            else:
+                document._changed(resource=self)
+
+    def _freeze(self):
+        """Prevent any further modification of the resource."""
+        self._frozen = True
+
+    def _add_document(self, document):
+        """Notify document of any future changes to this resource.
+
+        Documents are never removed, a document that no longer contains the
+        resource is only notified unnecessarily. A resource is almost always
+        in a single document, which is held on its own rather than in a dict.
+        """
+        import weakref
+
+        documents = self._documents
+
+        if documents is None:
+            self._documents = weakref.ref(document)
+            return
+
+        if not isinstance(documents, dict):
+            if documents() is document:
+                return
+
+            documents = self._documents = {id(documents()): documents}
+
+        documents[id(document)] = weakref.ref(document)
+
+    def _unshare_hints(self):
+        """Replace shared hints with a copy owned by this resource.
+
+        The contents of the hints are unchanged so nothing is invalidated.
+        """
+        hints = dict.get(self, 'hints')
+
+        if _is_shared(hints):
+            dict.__setitem__(self, 'hints', _track(_untracked(hints), self))
+
+    def _track_item(self, key, value):
+        """Replace a container the resource was created with by a tracked one.
+
+        Nested hints and variables are tracked so that modifying them in
+        place also invalidates the resource. Tracking copies them, so rather
+        than copying everything when a resource is created that is only done
+        when a container is handed out, or before anything is derived from
+        the resource. Until then the resource holds the containers it was
+        created with. The contents are unchanged so nothing is invalidated.
+        """
+        tracked = _track(value, self)
+
+        if tracked is not value:
+            dict.__setitem__(self, key, tracked)
+
+        return tracked
+
+    def _track_contents(self):
+        """Track every container in the resource, see _track_item."""
+        for key, value in list(dict.items(self)):
+            self._track_item(key, value)
+
+    def _compile_template(self):
+        """Fetch the compiled form of the current href-template.
+
+        Templates are compiled when they are assigned. A template that the
+        resource was created with is compiled the first time it is used, so
+        that loading a document doesn't compile templates that are never
+        used.
+        """
+        template = self.href_template
+        compiled = self._compiled_template
+
+        if compiled is None or compiled.template != template:
+            compiled = self._compiled_template = _template.compile(template)
+
+        return compiled
+
+    def __getitem__(self, key):
+        # shared hints are copied before they are handed out so that they
+        # can be modified like any other hints.
+        if key == 'hints':
+            self._unshare_hints()
+
+        value = super(Resource, self).__getitem__(key)
+        return self._track_item(key, value)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def items(self):
+        self._track_contents()
+        return super(Resource, self).items()
+
+    def values(self):
+        self._track_contents()
+        return super(Resource, self).values()
+
+    def __setitem__(self, key, value):
+        self._invalidate()
+        super(Resource, self).__setitem__(key, _track(value, self))
+
+        if key == 'href-template' and value:
+            self._compile_template()
+
+    def __delitem__(self, key):
+        self._invalidate()
+        super(Resource, self).__delitem__(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        self._invalidate()
+        super(Resource, self).clear()
+
+    def pop(self, *args):
+        self._invalidate()
+        return super(Resource, self).pop(*args)
+
+    def popitem(self):
+        self._invalidate()
+        return super(Resource, self).popitem()
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def _cached_json(self, key, render):
+        """Fetch the serialized form of this resource.
+
+        :param key: A hashable description of the serialization options.
+        :param callable render: Called with the resource to serialize it if
+            there is no cached result for key.
+        """
+        cache = self._json_cache
+
+        if cache is None:
+            self._track_contents()
+            cache = self._json_cache = {}
+
+        try:
+            return cache[key]
+        except KeyError:
+            value = cache[key] = render(self)
+            return value
+
+    def fingerprint(self):
+        """A hash of the contents of the resource.
+
+        The hash is calculated over a canonical serialization so resources
+        with the same contents have the same fingerprint in any process.
+
+        :rtype: str
+        """
+        return self._cached_json('fingerprint', _fingerprint)
+
     href_vars = _item_prop('href-vars', setdefault=dict)
     """A indication for variables in the template to construct a URI."""
 
@@ -178,12 +933,41 @@ class Resource(dict):
 
         :returns: bool or None if no hints are defined by the resource.
         """
+        # this is called concurrently by servers so it must only read from
+        # the resource, see Document.precompute.
         try:
-            allowed = self.hints['allow']
-        except KeyError:
+            allowed = dict.get(self, 'hints')['allow']
+        except (KeyError, TypeError):
             return None
-        else:
-            return method.upper() in (a.upper() for a in allowed)
+
+        method = method.upper()
+        return any(a == method or a.upper() == method for a in allowed)
+
+    def response_headers(self):
+        """The HTTP response headers that describe this resource.
+
+        The headers are derived from the hints, for example to send with a
+        response to an OPTIONS request or with a 405 response:
+
+        - Allow from allow
+        - Accept-Patch from accept-patch
+        - Accept-Post from accept-post
+        - Accept-Ranges from accept-ranges
+        - Link with a describedby relation from docs
+
+        The headers are built once and reused until the resource is
+        modified.
+
+        :returns: (name, value) pairs of header strings.
+        :rtype: tuple
+        """
+        headers = self._headers
+
+        if headers is None:
+            self._track_contents()
+            headers = self._headers = _build_headers(self)
+
+        return headers
 
     allow_delete = _allow_prop('DELETE')
     allow_get = _allow_prop('GET')
@@ -206,10 +990,88 @@ class Resource(dict):
             return self.href
 
         if self.href_template:
-            return uritemplate.expand(self.href_template, **kwargs)
+            return self._compile_template().expand(kwargs)
 
         raise MissingValues("Couldn't determine href from values in Resource")
 
+    def _split_uri(self, base_uri):
+        """Resolve the static part of the URI against a base URI.
+
+        Returns a tuple of the resolved prefix, the compiled template tail
+        that still needs to be expanded and appended to it, or None if there
+        is nothing left to expand, and the unresolved text of the prefix. If
+        no prefix could be resolved in advance the prefix is None and the tail
+        is the whole template. The result for the most recently used base URI
+        is cached until the resource changes.
+        """
+        cache = self._uri_cache
+
+        # a document resolves all of its resources against the same base URI
+        # so a single entry is enough and can't grow with the callers.
+        if cache is not None and cache[0] == base_uri:
+            return cache[1]
+
+        if self.href:
+            split = (_urljoin(base_uri, self.href), None, None)
+
+        elif self.href_template:
+            template = self.href_template
+            literal = template.split('{', 1)[0]
+
+            # only the literal text up to the last '/' before the first
+            # expression, and not within the authority, is resolved in
+            # advance. Resolving any further could remove dot-segments that
+            # expansion would have completed.
+            authority = literal.find('//')
+            authority = authority + 2 if authority >= 0 else 0
+            cut = literal.rfind('/', authority) + 1
+
+            if cut:
+                split = (_urljoin(base_uri, template[:cut]),
+                         _template.compile(template[cut:]),
+                         template[:cut])
+            else:
+                split = (None, self._compile_template(), None)
+
+        else:
+            msg = "Couldn't determine href from values in Resource"
+            raise MissingValues(msg)
+
+        self._uri_cache = (base_uri, split)
+        return split
+
+    def get_absolute_uri(self, base_uri, **kwargs):
+        """Get the URI for this resource resolved against a base URI.
+
+        Relative hrefs and templates are resolved against the base URI, for
+        example the URI the JSON home document was retrieved from. The
+        resolved href, and the resolved static prefix of a template, are
+        cached so that repeated calls only need to expand the template
+        variables.
+
+        :param str base_uri: The URI that relative references are resolved
+            against.
+
+        :raises jsonhome.MissingValues: If the resource has no href or
+            href-template.
+        """
+        prefix, tail, literal = self._split_uri(base_uri)
+
+        if tail is None:
+            return prefix
+
+        if prefix is None:
+            return _urljoin(base_uri, tail.expand(kwargs))
+
+        expanded = tail.expand(kwargs)
+
+        # dot segments in the values must be removed together with the
+        # prefix, as resolving the whole expanded template would.
+        if _has_dot_segments(expanded):
+            return _urljoin(base_uri, literal + expanded)
+
+        return prefix + expanded
+
     def set_uri(self, uri, **kwargs):
         """Set the URI on this resource based on its format.
 
@@ -232,13 +1094,11 @@ class Resource(dict):
             is not a relation passed as a keyword argument that matches the
             variable.
         """
-        variables = uritemplate.URITemplate(uri).variables
+        variables = _template.compile(uri).variable_names
 
         if variables:
             try:
-                href_vars = dict((n, kwargs.pop(n))
-                                 for v in variables
-                                 for n in v.variable_names)
+                href_vars = dict((n, kwargs.pop(n)) for n in variables)
             except KeyError as e:
                 msg = "Missing parameter %s from template" % str(e)
                 raise MissingValues(msg)
@@ -363,6 +1223,163 @@ class Document(dict):
     resource_class = Resource
     """The class of resource that should be created."""
 
+    def __init__(self, *args, **kwargs):
+        self._base_uri = kwargs.pop('base_uri', None)
+        self._uri_lru = None
+        self._version = 0
+        self._view_cache = {}
+        self._merkle = None
+        self._watching = False
+        super(Document, self).__init__(*args, **kwargs)
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),), {'_base_uri': self._base_uri})
+
+    def _watch(self):
+        """Have the resources notify the document when they are modified.
+
+        Only views and the Merkle tree need to know when a resource changes,
+        so resources are only told about the document once one of those is
+        created rather than for every document that is loaded.
+        """
+        if self._watching:
+            return
+
+        self._watching = True
+
+        for resource in self.values():
+            if isinstance(resource, Resource):
+                resource._add_document(self)
+
+    def _changed(self, relations=None, resource=None):
+        """Discard everything derived from the document contents.
+
+        This is called when relations are added or removed and when any of
+        the resources on the document are modified.
+
+        :param list relations: The relations that were added, removed or
+            replaced.
+        :param resource: The resource that was modified.
+
+        If neither is given then anything in the document may have changed.
+        """
+        self._version += 1
+        self._view_cache.clear()
+
+        if self._merkle is not None:
+            self._merkle._mark(relations, resource)
+
+    def __delitem__(self, relation):
+        self._changed([relation])
+        super(Document, self).__delitem__(relation)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        self._changed()
+        super(Document, self).clear()
+
+    def pop(self, *args):
+        self._changed(args[:1])
+        return super(Document, self).pop(*args)
+
+    def popitem(self):
+        item = super(Document, self).popitem()
+        self._changed(item[:1])
+        return item
+
+    def setdefault(self, relation, default=None):
+        if relation not in self:
+            self[relation] = default
+        return self[relation]
+
+    def update(self, *args, **kwargs):
+        resources = dict(*args, **kwargs)
+        self._changed(list(resources))
+
+        for relation, resource in resources.items():
+            if self._watching and isinstance(resource, Resource):
+                resource._add_document(self)
+
+            super(Document, self).__setitem__(relation, resource)
+
+    @property
+    def base_uri(self):
+        """The URI that relative resource URIs are resolved against.
+
+        This is typically the URI that the document was retrieved from. If it
+        is not set URIs are returned exactly as they appear in the document.
+        """
+        return self._base_uri
+
+    @base_uri.setter
+    def base_uri(self, value):
+        if self._uri_lru is not None:
+            self._uri_lru.clear()
+
+        self._base_uri = value
+
+    def enable_uri_cache(self, maxsize=128):
+        """Remember the results of get_uri for repeated calls.
+
+        The most recently used results of :py:meth:`get_uri` are cached keyed
+        by relation and template variables. Results are discarded when the
+        resource they came from is modified or replaced on the document.
+        Calls with unhashable variables are never cached.
+
+        :param int maxsize: The maximum number of results to keep.
+        """
+        self._uri_lru = _LRUCache(maxsize)
+
+    def disable_uri_cache(self):
+        """Stop caching get_uri results and discard the existing ones."""
+        self._uri_lru = None
+
+    def precompute(self):
+        """Prepare everything get_uri needs in advance.
+
+        Resolving a URI normally compiles and caches what it needs the first
+        time each resource is used. After precompute, and until the document
+        is modified, :py:meth:`get_uri`, :py:meth:`response_headers` and
+        :py:meth:`~jsonhome.Resource.is_allowed` only read from the document
+        and its resources so that they can be called from many threads
+        without contending on shared writes. This does not apply if the URI
+        cache is enabled as it records every lookup.
+        """
+        for resource in self.values():
+            if not isinstance(resource, Resource):
+                continue
+
+            resource.response_headers()
+
+            try:
+                if self._base_uri:
+                    template = resource._split_uri(self._base_uri)[1]
+                elif resource.href:
+                    template = None
+                elif resource.href_template:
+                    template = resource._compile_template()
+                else:
+                    continue
+            except MissingValues:
+                continue
+
+            if template is not None and not template.compiled:
+                template._parse()
+
+    def uri_cache_info(self):
+        """Statistics about the get_uri cache.
+
+        :returns: A named tuple of hits, misses, maxsize and currsize or None
+            if the cache is not enabled.
+        """
+        if self._uri_lru is None:
+            return None
+
+        return self._uri_lru.info()
+
     def __setitem__(self, relation, value):
         if not isinstance(value, self.resource_class):
             raise TypeError('Can only set valid resources on Document')
@@ -370,6 +1387,11 @@ class Document(dict):
         if relation in self:
             raise ResourceAlreadyExists(relation)
 
+        self._changed([relation])
+
+        if self._watching:
+            value._add_document(self)
+
         super(Document, self).__setitem__(relation, value)
 
     def get_uri(self, relation, **kwargs):
@@ -381,6 +1403,9 @@ class Document(dict):
         If there is a templated URI then the variables in the template will be
         evaluated against the values passed in through keyword arguments.
 
+        If the document has a base_uri then relative URIs are resolved against
+        it.
+
         :param str relation: The relation to the resource you wish to get the
             URI for.
         """
@@ -389,7 +1414,33 @@ class Document(dict):
         except KeyError:
             raise UnknownResource(relation)
 
-        return res.get_uri(**kwargs)
+        cache = self._uri_lru
+        key = None
+
+        if cache is not None:
+            try:
+                # equal values of different types like 1, 1.0 and True
+                # expand differently so they need different keys.
+                key = (relation,
+                       frozenset((k, type(v), v) for k, v in kwargs.items()))
+                hash(key)
+            except TypeError:
+                key = None
+            else:
+                try:
+                    return cache.get(key, res, res._version)
+                except KeyError:
+                    pass
+
+        if self._base_uri:
+            uri = res.get_absolute_uri(self._base_uri, **kwargs)
+        else:
+            uri = res.get_uri(**kwargs)
+
+        if key is not None:
+            cache.put(key, res, res._version, uri)
+
+        return uri
 
     def add_resource(self, relation, **kwargs):
         """Create a new resource on this document.
@@ -449,6 +1500,64 @@ class Document(dict):
         self[relation] = r
         return r
 
+    def response_headers(self, relation):
+        """The HTTP response headers that describe a resource.
+
+        See :py:meth:`~jsonhome.Resource.response_headers`.
+
+        :param str relation: The relation of the resource.
+
+        :raises jsonhome.UnknownResource: If the relation isn't in the
+            document.
+
+        :rtype: tuple
+        """
+        try:
+            res = self[relation]
+        except KeyError:
+            raise UnknownResource(relation)
+
+        return res.response_headers()
+
+    def view(self, key=None, predicate=None, hints=None):
+        """Create a filtered read-only view of the document.
+
+        See :py:class:`~jsonhome.view.DocumentView` for the arguments.
+
+        :rtype: :py:class:`~jsonhome.view.DocumentView`
+        """
+        from jsonhome import view
+        return view.DocumentView(self,
+                                 key=key,
+                                 predicate=predicate,
+                                 hints=hints)
+
+    def merkle_tree(self):
+        """Fetch the Merkle tree of the resources on this document.
+
+        The tree is created on first use and from then on only the relations
+        that changed are hashed again.
+
+        :rtype: :py:class:`~jsonhome.merkle.MerkleTree`
+        """
+        if self._merkle is None:
+            from jsonhome import merkle
+            self._watch()
+            self._merkle = merkle.MerkleTree(self)
+
+        return self._merkle
+
+    def fingerprint(self):
+        """A hash of the contents of the document.
+
+        Documents with the same resources have the same fingerprint in any
+        process, so comparing the fingerprints of two documents is enough to
+        tell if they are equal.
+
+        :rtype: str
+        """
+        return self.merkle_tree().root
+
     def to_dict(self):
         """Convert the document into a serializable format.
 
@@ -457,21 +1566,40 @@ class Document(dict):
 
         :rtype: dict
         """
+        import copy
         return {'resources': copy.deepcopy(self)}
 
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, base_uri=None, share_hints=False):
         """Create a json-home document from de-serialized data.
 
         Convert a dict that may have been received from an external site into
         a json-home document that can be manipulated and queried.
 
         :param dict data: The data to be converted.
+        :param str base_uri: The URI the data was retrieved from, which
+            relative resource URIs will be resolved against.
+        :param bool share_hints: Resources with equal hints share a single
+            copy of them, and equal strings within hints are shared, which
+            saves memory in documents where many resources have the same
+            hints. A resource makes its own copy of its hints when they are
+            fetched through any of its properties or by indexing it, so they
+            can be modified as usual. Shared hints reached any other way,
+            for example through items() or values(), raise
+            :py:class:`~jsonhome.ReadOnly` if they are modified.
 
         :rtype: :py:class:`~jsonhome.Document`
         """
+        resources = data['resources']
+
+        if share_hints:
+            pool = {}
+            resources = dict((relation, _share_resource_hints(d, pool))
+                             for relation, d in resources.items())
+
         return cls(dict((relation, cls.resource_class(d))
-                        for relation, d in data['resources'].items()))
+                        for relation, d in resources.items()),
+                   base_uri=base_uri)
 
     def to_json(self, **kwargs):
         """Convert the Document into JSON format.
@@ -479,17 +1607,63 @@ class Document(dict):
         Serialize the json-home document into valid JSON so that it can be sent
         to users.
 
+        Resources keep their serialized form for the arguments they were last
+        serialized with, so only the resources that have been modified since
+        need to be serialized again.
+
+        :param kwargs: Formatting arguments as accepted by
+            :py:func:`json.dumps`.
+
         :rtype: str
         """
-        return json.dumps(self.to_dict(), **kwargs)
+        return _dump_resources(self.items(), kwargs)
+
+    def iter_json(self, **kwargs):
+        """Convert the Document into JSON format one resource at a time.
+
+        The chunks joined together are identical to the output of
+        :py:meth:`to_json` with the same arguments. This is intended for
+        writing large documents to a file or a chunked HTTP response without
+        building the whole document in memory. Serialized resources that are
+        already cached by :py:meth:`to_json` are reused but new ones are not
+        kept.
+
+        The document should not be modified until iteration is finished.
+
+        :param kwargs: Formatting arguments as accepted by
+            :py:func:`json.dumps`.
+
+        :returns: An iterator of str.
+        """
+        return _iter_resources(self.items(), kwargs, cache=False)
+
+    def dump(self, fp, **kwargs):
+        """Write the Document in JSON format to a file.
+
+        See :py:meth:`iter_json`.
+
+        :param fp: A file-like object with a write method that accepts str.
+        :param kwargs: Formatting arguments as accepted by
+            :py:func:`json.dumps`.
+        """
+        for chunk in self.iter_json(**kwargs):
+            fp.write(chunk)
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, base_uri=None, share_hints=False):
         """Create a JSON home document from a JSON string.
 
         Take a string that was received from a remote service and load the JSON
         home document that describes its resources.
 
+        :param str base_uri: The URI the data was retrieved from, which
+            relative resource URIs will be resolved against.
+        :param bool share_hints: Share equal hints between resources, see
+            :py:meth:`from_dict`.
+
         :rtype: :py:class:`~jsonhome.Document`
         """
-        return cls.from_dict(json.loads(data))
+        import json
+        return cls.from_dict(json.loads(data),
+                             base_uri=base_uri,
+                             share_hints=share_hints)
@@ -0,0 +1,269 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Compile URI templates into specialized expanders.
+
+Most templates found in json-home documents only use simple expressions with
+scalar values, for example ``/widgets{/widget_id}`` or ``/a/{b}/c{?q}``. For
+these the template is compiled once into a format string of its literal text
+and a list of expression expanders that have their operator specific
+separators and quoting resolved in advance.
+
+Anything the compiler does not understand, either in the template or in the
+values it is expanded with, is handed to uritemplate so the result is always
+identical to :py:func:`uritemplate.expand`.
+"""
+
+try:
+    _SCALARS = (basestring, int, long, float)  # noqa
+except NameError:  # python 3
+    _SCALARS = (str, int, float)
+
+
+# these must match the parsing and quoting rules of uritemplate. They are
+# implemented here rather than with re and urllib so that neither needs to
+# be imported until a template needs the general uritemplate code.
+_ALPHANUMERIC = ('abcdefghijklmnopqrstuvwxyz'
+                 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                 '0123456789')
+_HEXDIGITS = frozenset('0123456789abcdefABCDEF')
+_NAME_CHARACTERS = frozenset(_ALPHANUMERIC + '_.%')
+_UNRESERVED = frozenset(_ALPHANUMERIC + '~-_.')
+_RESERVED = _UNRESERVED.union(":/?#[]@" + "!$&'()*+,;=")
+
+# operator: (prefix, separator, style)
+_OPERATORS = {'': ('', ',', 'simple'),
+              '+': ('', ',', 'reserved'),
+              '#': ('#', ',', 'reserved'),
+              '.': ('.', '.', 'simple'),
+              '/': ('/', '/', 'simple'),
+              ';': (';', ';', 'named'),
+              '?': ('?', '&', 'form'),
+              '&': ('&', '&', 'form')}
+
+_MAX_CACHED = 1024
+
+# the least recently used templates are discarded first. This is created on
+# first use so that collections is only imported when a template is.
+_compiled = None
+
+
+class _Unsupported(Exception):
+    """The compiled template can't expand the value it was given."""
+
+
+# expanding templates must not write to shared state so that it scales
+# across threads, so only ASCII escapes are kept and they are built up front.
+_ASCII_ESCAPES = dict((chr(i), '%%%02X' % i) for i in range(128))
+
+
+def _escape(character):
+    try:
+        return _ASCII_ESCAPES[character]
+    except KeyError:
+        return ''.join('%%%02X' % b
+                       for b in bytearray(character.encode('utf-8')))
+
+
+def _quote(value, safe):
+    """Percent-encode value, equivalent to urllib's quote."""
+    if safe.issuperset(value):
+        return value
+    return ''.join(c if c in safe else _escape(c) for c in value)
+
+
+def _is_quoted(value):
+    """Test if value contains any percent-encoded characters."""
+    index = value.find('%')
+
+    while index >= 0:
+        digits = value[index + 1:index + 3]
+
+        if len(digits) == 2 and _HEXDIGITS.issuperset(digits):
+            return True
+
+        index = value.find('%', index + 1)
+
+    return False
+
+
+def _quote_simple(value):
+    return _quote(value, _UNRESERVED)
+
+
+def _quote_reserved(value):
+    return value if _is_quoted(value) else _quote(value, _RESERVED)
+
+
+def _find_expressions(template):
+    """Find each {...} expression, the same as uritemplate's regex."""
+    start = template.find('{')
+
+    while start >= 0:
+        end = template.find('}', start + 1)
+
+        if end < 0:
+            return
+
+        if end > start + 1:
+            yield start, end + 1, template[start + 1:end]
+            start = template.find('{', end + 1)
+        else:
+            start = template.find('{', start + 1)
+
+
+def _expression(operator, names):
+    """Build the function that expands one {...} expression."""
+    prefix, separator, style = _OPERATORS[operator]
+    quote_value = _quote_reserved if style == 'reserved' else _quote_simple
+
+    def _value(variables, name):
+        value = variables.get(name)
+
+        if value is None:
+            return None
+        if not isinstance(value, _SCALARS):
+            raise _Unsupported()
+
+        text = value if isinstance(value, str) else str(value)
+
+        if style == 'named':
+            return '%s=%s' % (name, quote_value(text)) if value else name
+        if style == 'form':
+            return '%s=%s' % (name, quote_value(text) if value else '')
+        return quote_value(text)
+
+    if len(names) == 1:
+        name = names[0]
+
+        def _expand(variables):
+            value = _value(variables, name)
+            return '' if value is None else prefix + value
+
+    else:
+        def _expand(variables):
+            values = [v for v in (_value(variables, n) for n in names)
+                      if v is not None]
+            return prefix + separator.join(values) if values else ''
+
+    return _expand
+
+
+class Template(object):
+    """A URI template that can be expanded with a dict of variables.
+
+    Use :py:func:`compile` rather than creating these directly.
+    """
+
+    __slots__ = ('template', 'variable_names', '_format', '_expressions',
+                 '_uritemplate')
+
+    def __init__(self, template):
+        self.template = template
+        self._uritemplate = None
+
+        names = []
+        expressions = []
+        literals = []
+        end = 0
+
+        for start, stop, expression in _find_expressions(template):
+            literals.append(template[end:start].replace('%', '%%'))
+            end = stop
+
+            operator = expression[0] if expression[0] in _OPERATORS else ''
+            expression_names = expression[len(operator):].split(',')
+
+            if expressions is not None and all(
+                    n and _NAME_CHARACTERS.issuperset(n)
+                    for n in expression_names):
+                expressions.append(_expression(operator, expression_names))
+            else:
+                expressions = None
+
+            names.extend(n for n in expression_names if n not in names)
+
+        if expressions is None:
+            # there is something in the template we can't compile so fetch
+            # the variable names as uritemplate understands them.
+            names = list(self._parse().variable_names)
+        else:
+            literals.append(template[end:].replace('%', '%%'))
+
+        self.variable_names = tuple(names)
+        self._expressions = expressions
+        self._format = '%s'.join(literals)
+
+    def _parse(self):
+        if self._uritemplate is None:
+            import uritemplate
+            self._uritemplate = uritemplate.URITemplate(self.template)
+        return self._uritemplate
+
+    @property
+    def compiled(self):
+        """True if expansion doesn't need the general uritemplate code."""
+        return self._expressions is not None
+
+    def expand(self, variables):
+        """Expand the template with a dict of variables.
+
+        :param dict variables: The values to substitute into the template.
+
+        :rtype: str
+        """
+        expressions = self._expressions
+
+        if expressions is not None:
+            if not expressions:
+                return self.template
+
+            try:
+                return self._format % tuple(e(variables) for e in expressions)
+            except _Unsupported:
+                pass
+
+        return self._parse().expand(variables)
+
+
+def compile(template):
+    """Fetch the compiled form of a URI template.
+
+    Compiled templates are shared between all the resources that use the same
+    template string.
+
+    :param str template: The URI template.
+
+    :rtype: :py:class:`Template`
+    """
+    global _compiled
+
+    cache = _compiled
+
+    if cache is None:
+        import collections
+        cache = _compiled = collections.OrderedDict()
+
+    try:
+        # removed and added again to make it the most recently used.
+        compiled = cache.pop(template)
+    except KeyError:
+        compiled = Template(template)
+
+        while len(cache) >= _MAX_CACHED:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                break
+
+    cache[template] = compiled
+    return compiled
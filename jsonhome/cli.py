@@ -0,0 +1,625 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""The jsonhome command line tool.
+
+Every command accepts any number of files and directories. Directories are
+searched for documents and the files are processed across a pool of worker
+processes, with the result for each file reported as soon as it and the files
+before it are done::
+
+    $ jsonhome validate api/
+    $ jsonhome format --canonical --in-place api/
+    $ jsonhome convert --to yaml --output-dir build/ api/
+    $ jsonhome merge -o home.json api/
+    $ jsonhome bench --number 1000 api/
+    $ jsonhome scale --max-workers 8 api/home.json
+
+YAML documents require PyYAML to be installed.
+"""
+
+import argparse
+import functools
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import timeit
+
+import jsonhome
+
+_JSON_SUFFIXES = ('.json',)
+_YAML_SUFFIXES = ('.yaml', '.yml')
+
+
+class _Result(object):
+    """The outcome of processing a single file.
+
+    :param str path: The file that was processed.
+    :param str output: Text to report for the file, if any.
+    :param str error: Why processing the file failed, if it did.
+    :param data: A value to hand back to the parent process.
+    """
+
+    def __init__(self, path, output=None, error=None, data=None):
+        self.path = path
+        self.output = output
+        self.error = error
+        self.data = data
+
+
+def _find_documents(paths):
+    """Expand the files and directories given on the command line.
+
+    Directories are searched recursively for .json, .yaml and .yml files.
+
+    :returns: An iterator of tuples of the path of each file and its path
+        relative to the directory it was found in, or its name if it was
+        given directly.
+    """
+    suffixes = _JSON_SUFFIXES + _YAML_SUFFIXES
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path, os.path.basename(path)
+            continue
+
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+
+            for name in sorted(files):
+                if name.endswith(suffixes):
+                    found = os.path.join(root, name)
+                    yield found, os.path.relpath(found, path)
+
+
+def _convert_targets(documents, fmt, output_dir):
+    """Decide where convert writes each document in an output directory.
+
+    Documents keep their path relative to the directory they were found in.
+
+    :param list documents: Tuples as returned by :py:func:`_find_documents`.
+
+    :raises ValueError: If two documents would be written to the same file
+        or a document would overwrite one of the inputs.
+
+    :returns: A dict of the path of each document to its target.
+    """
+    inputs = set(os.path.realpath(path) for path, _ in documents)
+    targets = {}
+    written = {}
+
+    for path, name in documents:
+        name = '%s.%s' % (os.path.splitext(name)[0], fmt)
+        target = os.path.join(output_dir, name)
+        key = os.path.realpath(target)
+
+        if key in inputs:
+            raise ValueError('%s would overwrite the input %s' %
+                             (path, target))
+
+        if key in written:
+            raise ValueError('%s and %s would both be written to %s' %
+                             (written[key], path, target))
+
+        written[key] = path
+        targets[path] = target
+
+    return targets
+
+
+def _import_yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise ValueError('PyYAML is required for YAML documents')
+
+    return yaml
+
+
+def _is_yaml(path):
+    return path.endswith(_YAML_SUFFIXES)
+
+
+def _read(path):
+    with open(path) as f:
+        text = f.read()
+
+    if _is_yaml(path):
+        return _import_yaml().safe_load(text)
+
+    return json.loads(text)
+
+
+def _dump(document, fmt, canonical=False):
+    if fmt == 'yaml':
+        # safe_dump only accepts the plain types, not resources.
+        data = json.loads(document.to_json())
+        return _import_yaml().safe_dump(data, default_flow_style=False)
+
+    if canonical:
+        return document.to_json(sort_keys=True, separators=(',', ':'))
+
+    return document.to_json(indent=4, sort_keys=True)
+
+
+def _check(data):
+    """Find the problems with de-serialized json-home data.
+
+    :returns: A list of error messages, empty if the data is valid.
+    """
+    if not isinstance(data, dict):
+        return ['document must be an object']
+
+    resources = data.get('resources')
+
+    if not isinstance(resources, dict):
+        return ['document must have a resources object']
+
+    errors = []
+
+    for relation, resource in sorted(resources.items()):
+        if not isinstance(resource, dict):
+            errors.append('%s: resource must be an object' % relation)
+            continue
+
+        links = [k for k in ('href', 'href-template') if k in resource]
+
+        if len(links) != 1:
+            errors.append('%s: resource must have one of href or '
+                          'href-template' % relation)
+
+        for key in ('href-vars', 'hints'):
+            if not isinstance(resource.get(key, {}), dict):
+                errors.append('%s: %s must be an object' % (relation, key))
+
+    return errors
+
+
+def _load(path):
+    data = _read(path)
+    errors = _check(data)
+
+    if errors:
+        raise ValueError('; '.join(errors))
+
+    return jsonhome.Document.from_dict(data)
+
+
+def _variables(resource):
+    """Make up a value for each variable of a resource's template."""
+    if resource.href_template is None:
+        return {}
+
+    compiled = resource._compile_template()
+    return dict((name, 'x') for name in compiled.variable_names)
+
+
+def _validate(path):
+    _load(path)
+    return _Result(path)
+
+
+def _format(path, canonical=False, in_place=False):
+    if in_place and _is_yaml(path):
+        raise ValueError('YAML documents can not be formatted in place')
+
+    output = _dump(_load(path), 'json', canonical=canonical)
+
+    if not in_place:
+        return _Result(path, output=output)
+
+    with open(path, 'w') as f:
+        f.write(output)
+        f.write('\n')
+
+    return _Result(path)
+
+
+def _convert(path, fmt='json', targets=None):
+    output = _dump(_load(path), fmt)
+
+    if targets is None:
+        return _Result(path, output=output)
+
+    target = targets[path]
+    directory = os.path.dirname(target)
+
+    try:
+        os.makedirs(directory)
+    except OSError:
+        # another worker may have just created it.
+        if not os.path.isdir(directory):
+            raise
+
+    with open(target, 'w') as f:
+        f.write(output)
+
+    return _Result(path, output=target)
+
+
+def _parse(path):
+    return _Result(path, data=_load(path).to_dict())
+
+
+def _bench(path, number=100):
+    if _is_yaml(path):
+        raise ValueError('only JSON documents can be benchmarked')
+
+    with open(path) as f:
+        text = f.read()
+
+    doc = jsonhome.Document.from_json(text)
+    calls = [(relation, _variables(resource))
+             for relation, resource in doc.items()]
+
+    def _get_uris():
+        for relation, variables in calls:
+            doc.get_uri(relation, **variables)
+
+    # to_json is timed as it is normally used, reusing the serialized
+    # resources from the previous call.
+    timings = [('from_json', lambda: jsonhome.Document.from_json(text), 1),
+               ('to_json', doc.to_json, 1),
+               ('get_uri', _get_uris, max(len(calls), 1))]
+
+    results = []
+
+    for name, func, per_loop in timings:
+        seconds = timeit.Timer(func).timeit(number=number)
+        results.append('%s %.2fus' % (name,
+                                      seconds * 1e6 / number / per_loop))
+
+    return _Result(path, output=' '.join(results))
+
+
+def _workload(doc, operation):
+    """Build a function that calls operation once for every resource.
+
+    :returns: A tuple of the function and the number of calls it makes.
+    """
+    if operation == 'is_allowed':
+        resources = list(doc.values())
+
+        def _call():
+            for resource in resources:
+                resource.is_allowed('GET')
+
+        return _call, len(resources)
+
+    calls = [(relation, _variables(resource))
+             for relation, resource in doc.items()]
+
+    def _call():
+        for relation, variables in calls:
+            doc.get_uri(relation, **variables)
+
+    return _call, len(calls)
+
+
+def _timed(func, number, start):
+    """Run func number times, starting once start has passed.
+
+    :param float start: The time.time() to start at, so that workers in
+        different processes run at the same time.
+
+    :returns: A tuple of the start and end times.
+    """
+    delay = start - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+    begin = time.time()
+    for i in range(number):
+        func()
+    return begin, time.time()
+
+
+def _scale_process(args):
+    path, operation, number, start = args
+    doc = _load(path)
+    doc.precompute()
+    func, calls = _workload(doc, operation)
+    func()
+
+    begin, end = _timed(func, number, start)
+    return begin, end, calls * number
+
+
+def _scale_threads(doc, operation, number, workers):
+    # every thread shares the one document, that is what is being measured.
+    func, calls = _workload(doc, operation)
+    func()
+
+    start = time.time() + 0.05
+    times = []
+
+    def _thread():
+        times.append(_timed(func, number, start))
+
+    threads = [threading.Thread(target=_thread) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    return [(begin, end, calls * number) for begin, end in times]
+
+
+def _scale_processes(path, operation, number, workers):
+    pool = multiprocessing.Pool(workers)
+
+    try:
+        # make sure every worker has started before starting the clock.
+        pool.map(time.sleep, [0.01] * workers, 1)
+        start = time.time() + 0.1
+        return pool.map(_scale_process,
+                        [(path, operation, number, start)] * workers,
+                        1)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _scale(args, stdout):
+    """Measure how resolution throughput grows with threads and processes.
+
+    Every worker makes the same number of calls and throughput is the total
+    calls divided by the time from the first worker starting to the last
+    finishing.
+    """
+    doc = _load(args.path)
+    doc.precompute()
+
+    modes = ('threads', 'processes') if args.mode == 'both' else (args.mode,)
+    workers = args.max_workers or multiprocessing.cpu_count()
+
+    for mode in modes:
+        baseline = None
+
+        for count in range(1, workers + 1):
+            if mode == 'threads':
+                runs = _scale_threads(doc, args.operation, args.number, count)
+            else:
+                runs = _scale_processes(args.path,
+                                        args.operation,
+                                        args.number,
+                                        count)
+
+            elapsed = max(r[1] for r in runs) - min(r[0] for r in runs)
+            rate = sum(r[2] for r in runs) / max(elapsed, 1e-9)
+            baseline = baseline or rate
+
+            stdout.write('%s %d: %.0f calls/s %.2fx\n' %
+                         (mode, count, rate, rate / baseline))
+            stdout.flush()
+
+    return 0
+
+
+def _run(func, path):
+    # exceptions are reported per file rather than stopping the pool.
+    try:
+        return func(path)
+    except Exception as e:
+        return _Result(path, error=str(e) or e.__class__.__name__)
+
+
+def _process(func, paths, jobs=None, chunksize=8):
+    """Apply func to each path yielding the results in order.
+
+    :param func: A picklable function that takes a path and returns a
+        :py:class:`_Result`.
+    :param list paths: The files to process.
+    :param int jobs: The number of worker processes. Defaults to the number of
+        CPUs. With one job, or one file, no processes are started.
+    :param int chunksize: The number of files sent to a worker at a time.
+    """
+    run = functools.partial(_run, func)
+
+    if jobs is None:
+        jobs = multiprocessing.cpu_count()
+
+    jobs = min(jobs, len(paths))
+
+    if jobs <= 1:
+        for path in paths:
+            yield run(path)
+        return
+
+    pool = multiprocessing.Pool(jobs)
+
+    try:
+        for result in pool.imap(run, paths, chunksize):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _report(results, stdout, stderr, prefix=True):
+    """Print each result as it arrives.
+
+    :returns: The number of files that failed.
+    """
+    failures = 0
+
+    for result in results:
+        if result.error:
+            failures += 1
+            stderr.write('%s: %s\n' % (result.path, result.error))
+        elif result.output is not None:
+            if prefix:
+                stdout.write('%s: ' % result.path)
+            stdout.write('%s\n' % result.output)
+        stdout.flush()
+
+    return failures
+
+
+def _merge(results, stderr):
+    doc = jsonhome.Document()
+    sources = {}
+    failures = 0
+
+    for result in results:
+        if result.error:
+            failures += 1
+            stderr.write('%s: %s\n' % (result.path, result.error))
+            continue
+
+        for relation, resource in result.data['resources'].items():
+            if relation not in doc:
+                doc[relation] = jsonhome.Resource(resource)
+                sources[relation] = result.path
+            elif doc[relation] != resource:
+                failures += 1
+                stderr.write('%s: %s conflicts with %s\n' %
+                             (result.path, relation, sources[relation]))
+
+    return doc, failures
+
+
+def _parser():
+    parser = argparse.ArgumentParser(prog='jsonhome',
+                                     description='Process json-home '
+                                                 'documents.')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Number of worker processes, defaults to the '
+                             'number of CPUs.')
+    parser.add_argument('--chunksize', type=int, default=8,
+                        help='Number of files sent to a worker at a time.')
+
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    def _add(name, help):
+        p = subparsers.add_parser(name, help=help)
+        p.add_argument('paths', nargs='+', metavar='PATH',
+                       help='Documents or directories of documents.')
+        return p
+
+    _add('validate', 'Check that documents are valid json-home.')
+
+    p = _add('format', 'Pretty print or canonicalize documents.')
+    p.add_argument('--canonical', action='store_true',
+                   help='Write compact JSON with sorted keys.')
+    p.add_argument('-i', '--in-place', action='store_true',
+                   help='Rewrite the documents rather than printing them.')
+
+    p = _add('convert', 'Convert documents between JSON and YAML.')
+    p.add_argument('--to', choices=('json', 'yaml'), default='json',
+                   dest='fmt', help='The format to convert to.')
+    p.add_argument('-d', '--output-dir',
+                   help='Write each document into this directory rather than '
+                        'printing them. Documents found in a directory keep '
+                        'their path relative to it.')
+
+    p = _add('merge', 'Combine the resources of documents into one.')
+    p.add_argument('-o', '--output',
+                   help='Write the merged document to this file.')
+
+    p = _add('bench', 'Time common operations on documents.')
+    p.add_argument('-n', '--number', type=int, default=100,
+                   help='Number of times to repeat each operation.')
+
+    p = subparsers.add_parser('scale',
+                              help='Measure resolution throughput with '
+                                   'increasing numbers of threads and '
+                                   'processes.')
+    p.add_argument('path', metavar='PATH', help='The document to resolve.')
+    p.add_argument('--operation', choices=('get_uri', 'is_allowed'),
+                   default='get_uri', help='The operation to measure.')
+    p.add_argument('--mode', choices=('threads', 'processes', 'both'),
+                   default='both', help='How to run the workers.')
+    p.add_argument('-w', '--max-workers', type=int, default=None,
+                   help='Measure 1 up to this many workers, defaults to the '
+                        'number of CPUs.')
+    p.add_argument('-n', '--number', type=int, default=1000,
+                   help='Number of times each worker calls the operation '
+                        'for every resource.')
+
+    return parser
+
+
+def main(argv=None):
+    """Run the jsonhome command line tool.
+
+    :param list argv: The command line arguments, defaults to sys.argv.
+
+    :returns: The exit status, non-zero if any document failed.
+    :rtype: int
+    """
+    args = _parser().parse_args(argv)
+    stdout = sys.stdout
+    stderr = sys.stderr
+
+    if args.command == 'scale':
+        return _scale(args, stdout)
+
+    documents = list(_find_documents(args.paths))
+    paths = [path for path, _ in documents]
+    prefix = len(paths) > 1
+
+    if args.command == 'validate':
+        func = _validate
+    elif args.command == 'format':
+        func = functools.partial(_format,
+                                 canonical=args.canonical,
+                                 in_place=args.in_place)
+    elif args.command == 'convert':
+        targets = None
+
+        if args.output_dir is not None:
+            try:
+                targets = _convert_targets(documents,
+                                           args.fmt,
+                                           args.output_dir)
+            except ValueError as e:
+                stderr.write('%s\n' % e)
+                return 1
+
+        func = functools.partial(_convert, fmt=args.fmt, targets=targets)
+        prefix = prefix or targets is not None
+    elif args.command == 'bench':
+        func = functools.partial(_bench, number=args.number)
+        prefix = True
+    else:
+        func = _parse
+
+    results = _process(func, paths, jobs=args.jobs, chunksize=args.chunksize)
+
+    if args.command != 'merge':
+        failures = _report(results, stdout, stderr, prefix=prefix)
+        return 1 if failures else 0
+
+    doc, failures = _merge(results, stderr)
+
+    if failures:
+        return 1
+
+    output = _dump(doc, 'json')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+            f.write('\n')
+    else:
+        stdout.write('%s\n' % output)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
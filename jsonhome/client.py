@@ -0,0 +1,407 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Make HTTP requests to the resources of a json-home document.
+
+The hints in a json-home document already tell a client which methods and
+request formats a resource accepts, so there is no need for an OPTIONS
+request or trial and error to find out::
+
+    >>> doc = jsonhome.Document.from_json(data,
+    ...                                   base_uri='http://mysite.com/home')
+    >>> session = client.Session(doc)
+
+    >>> resp = session.post('http://mysite.com/rel/widgets',
+    ...                     body={'name': 'sprocket'})
+
+    >>> session.delete('http://mysite.com/rel/widgets', widget_id='1234')
+    Traceback (most recent call last):
+      ...
+    jsonhome.MethodNotAllowed: DELETE
+
+Requests that the hints rule out are rejected without contacting the server.
+Connections are kept open and reused for later requests to the same host.
+"""
+
+import errno
+import json
+import select
+import socket
+import threading
+
+try:
+    from http import client as http_client
+except ImportError:  # python 2
+    import httplib as http_client
+
+try:
+    from urllib import parse as urlparse
+except ImportError:  # python 2
+    import urlparse
+
+import jsonhome
+
+# the hint listing the accepted content types for each method.
+_ACCEPT_HINTS = {'PATCH': 'accept-patch',
+                 'POST': 'accept-post'}
+
+_JSON_TYPE = 'application/json'
+
+# methods that can be sent again without changing the result.
+_IDEMPOTENT = frozenset(['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT', 'TRACE'])
+
+# a server closing an idle connection shows up as one of these when the next
+# request is sent on it. python 2 raises BadStatusLine for an empty response.
+_DISCONNECTED = getattr(http_client,
+                        'RemoteDisconnected',
+                        http_client.BadStatusLine)
+_DISCONNECTED_ERRNOS = (errno.ECONNRESET, errno.EPIPE)
+
+
+def _hint(resource, name):
+    # read hints without the setdefault of the resource properties so that
+    # making a request never modifies the document.
+    return (dict.get(resource, 'hints') or {}).get(name)
+
+
+def _is_disconnected(error):
+    # a timeout means the server may still be working on the request.
+    if isinstance(error, socket.timeout):
+        return False
+
+    if isinstance(error, _DISCONNECTED):
+        return True
+
+    return getattr(error, 'errno', None) in _DISCONNECTED_ERRNOS
+
+
+def _is_dropped(connection):
+    # an idle connection should have nothing to read, if it does the server
+    # has closed it or sent something unexpected and it can't be reused.
+    sock = connection.sock
+
+    if sock is None or sock.fileno() < 0:
+        return True
+
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (select.error, ValueError):
+        return True
+
+
+def _media_type(content_type):
+    # media types are compared on type/subtype, which are case-insensitive,
+    # ignoring any parameters such as the charset.
+    return content_type.split(';', 1)[0].strip().lower()
+
+
+def _is_json(content_type):
+    content_type = _media_type(content_type)
+    return content_type == _JSON_TYPE or content_type.endswith('+json')
+
+
+class Response(object):
+    """The response to a request.
+
+    The body has always been read completely so that the connection can be
+    reused.
+    """
+
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        """The HTTP status code."""
+
+        self.reason = reason
+        """The HTTP reason phrase."""
+
+        self.headers = headers
+        """A dict of the response headers with lower case names."""
+
+        self.body = body
+        """The response body as bytes."""
+
+    def json(self):
+        """Decode a JSON response body."""
+        return json.loads(self.body.decode('utf-8'))
+
+
+class ConnectionPool(object):
+    """Idle connections to a single host that can be reused.
+
+    :param str scheme: http or https.
+    :param str netloc: The host and optional port to connect to.
+    :param float timeout: The socket timeout for new connections.
+    :param int maxsize: The most idle connections to keep.
+    """
+
+    def __init__(self, scheme, netloc, timeout=None, maxsize=10):
+        if scheme == 'https':
+            self._connection_class = http_client.HTTPSConnection
+        elif scheme == 'http':
+            self._connection_class = http_client.HTTPConnection
+        else:
+            raise ValueError('Unsupported URI scheme: %s' % scheme)
+
+        self.netloc = netloc
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Fetch an idle connection or create a new one.
+
+        Idle connections that the server has closed are discarded.
+
+        :returns: A tuple of the connection and if it was reused.
+        """
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+
+                connection = self._idle.pop()
+
+            if not _is_dropped(connection):
+                return connection, True
+
+            connection.close()
+
+        kwargs = {}
+        if self.timeout is not None:
+            kwargs['timeout'] = self.timeout
+
+        return self._connection_class(self.netloc, **kwargs), False
+
+    def put(self, connection):
+        """Return a connection after a complete response was read."""
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(connection)
+                return
+
+        connection.close()
+
+    def close(self):
+        """Close all the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+
+        for connection in idle:
+            connection.close()
+
+
+class Session(object):
+    """Send requests to resources by relation.
+
+    :param document: The document to resolve relations with. URIs must
+        resolve to absolute URIs so the document will normally have a
+        base_uri.
+    :type document: :py:class:`jsonhome.Document`
+    :param dict headers: Headers to send with every request.
+    :param float timeout: The socket timeout for connections.
+    :param int pool_maxsize: The most idle connections to keep for each host.
+    """
+
+    def __init__(self, document, headers=None, timeout=None, pool_maxsize=10):
+        self.document = document
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close all the connections held by the session."""
+        with self._lock:
+            pools, self._pools = self._pools, {}
+
+        for pool in pools.values():
+            pool.close()
+
+    def _pool(self, scheme, netloc):
+        key = (scheme, netloc)
+
+        with self._lock:
+            try:
+                return self._pools[key]
+            except KeyError:
+                pool = ConnectionPool(scheme,
+                                      netloc,
+                                      timeout=self.timeout,
+                                      maxsize=self.pool_maxsize)
+                self._pools[key] = pool
+                return pool
+
+    def prepare(self, method, relation, body=None, headers=None,
+                content_type=None, **kwargs):
+        """Check a request against the resource hints and build it.
+
+        No network requests are made.
+
+        :param str method: The HTTP method.
+        :param str relation: The relation of the resource to request.
+        :param body: The request body. Anything other than bytes or a string
+            is encoded as JSON.
+        :param dict headers: Additional request headers.
+        :param str content_type: The Content-Type of the body. Defaults to
+            the first type the resource accepts for the method, or JSON.
+        :param kwargs: Variables for the resource's URI template.
+
+        :raises jsonhome.UnknownResource: If the relation isn't in the
+            document.
+        :raises jsonhome.MethodNotAllowed: If the hints don't allow method.
+        :raises jsonhome.UnsupportedMediaType: If the hints don't accept the
+            content type for method.
+        :raises jsonhome.RangeNotSupported: If a Range header is given and the
+            hints don't accept its unit.
+
+        :returns: A tuple of method, absolute URI, headers and body bytes.
+        """
+        method = method.upper()
+
+        try:
+            resource = self.document[relation]
+        except KeyError:
+            raise jsonhome.UnknownResource(relation)
+
+        allow = _hint(resource, 'allow')
+        if allow is not None and method not in (a.upper() for a in allow):
+            raise jsonhome.MethodNotAllowed(method)
+
+        uri = self.document.get_uri(relation, **kwargs)
+
+        request_headers = dict(self.headers)
+        request_headers.update(headers or {})
+        header_names = dict((k.lower(), k) for k in request_headers)
+
+        if 'range' in header_names:
+            unit = request_headers[header_names['range']].split('=', 1)[0]
+            ranges = _hint(resource, 'accept-ranges')
+
+            # range units are case-insensitive on both sides
+            if ranges is not None and (unit.strip().lower() not in
+                                       [r.lower() for r in ranges]):
+                raise jsonhome.RangeNotSupported(unit)
+
+        if body is None:
+            return method, uri, request_headers, None
+
+        accepted = _hint(resource, _ACCEPT_HINTS.get(method)) or []
+        encode = not isinstance(body, (bytes, jsonhome._string_types))
+
+        if content_type is None and 'content-type' in header_names:
+            content_type = request_headers.pop(header_names['content-type'])
+
+        if content_type is None:
+            if encode:
+                json_types = [t for t in accepted if _is_json(t)]
+                content_type = (json_types or [_JSON_TYPE])[0]
+            else:
+                content_type = accepted[0] if accepted else None
+
+        media_types = [_media_type(t) for t in accepted]
+
+        if media_types and _media_type(content_type) not in media_types:
+            raise jsonhome.UnsupportedMediaType(content_type)
+
+        if encode:
+            body = json.dumps(body)
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+
+        if content_type is not None:
+            request_headers['Content-Type'] = content_type
+
+        return method, uri, request_headers, body
+
+    def request(self, method, relation, **kwargs):
+        """Send a request to a resource.
+
+        The arguments are the same as for :py:meth:`prepare`.
+
+        :rtype: :py:class:`Response`
+        """
+        method, uri, headers, body = self.prepare(method, relation, **kwargs)
+
+        parts = urlparse.urlsplit(uri)
+
+        if not parts.netloc:
+            raise jsonhome.MissingValues('Relation %s resolved to %s which is '
+                                         'not an absolute URI' %
+                                         (relation, uri))
+
+        target = parts.path or '/'
+        if parts.query:
+            target = '%s?%s' % (target, parts.query)
+
+        pool = self._pool(parts.scheme, parts.netloc)
+
+        while True:
+            connection, reused = pool.get()
+
+            try:
+                connection.request(method, target, body, headers)
+                resp = connection.getresponse()
+                data = resp.read()
+            except (http_client.HTTPException, socket.error) as e:
+                connection.close()
+
+                # the server may have closed an idle connection just as it
+                # was reused. Only requests that can safely be sent twice are
+                # retried as the server may have received it anyway.
+                if reused and method in _IDEMPOTENT and _is_disconnected(e):
+                    continue
+
+                raise
+
+            break
+
+        if resp.will_close:
+            connection.close()
+        else:
+            pool.put(connection)
+
+        return Response(resp.status,
+                        resp.reason,
+                        dict((k.lower(), v) for k, v in resp.getheaders()),
+                        data)
+
+    def get(self, relation, **kwargs):
+        """Send a GET request, see :py:meth:`request`."""
+        return self.request('GET', relation, **kwargs)
+
+    def head(self, relation, **kwargs):
+        """Send a HEAD request, see :py:meth:`request`."""
+        return self.request('HEAD', relation, **kwargs)
+
+    def post(self, relation, **kwargs):
+        """Send a POST request, see :py:meth:`request`."""
+        return self.request('POST', relation, **kwargs)
+
+    def put(self, relation, **kwargs):
+        """Send a PUT request, see :py:meth:`request`."""
+        return self.request('PUT', relation, **kwargs)
+
+    def patch(self, relation, **kwargs):
+        """Send a PATCH request, see :py:meth:`request`."""
+        return self.request('PATCH', relation, **kwargs)
+
+    def delete(self, relation, **kwargs):
+        """Send a DELETE request, see :py:meth:`request`."""
+        return self.request('DELETE', relation, **kwargs)
@@ -0,0 +1,270 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Merkle trees for comparing and synchronizing json-home documents.
+
+Each relation is assigned to one of a fixed number of buckets by a stable
+hash of its name. The hash of a bucket covers the relations in it and the
+:py:meth:`~jsonhome.Resource.fingerprint` of their resources, and each node
+above the buckets hashes its children. Two documents are equal if their root
+hashes are equal, and when they aren't only the subtrees with different
+hashes need to be compared to find the relations that differ::
+
+    >>> local.fingerprint() == remote.fingerprint()
+    False
+    >>> merkle.diff(local.merkle_tree(), remote.merkle_tree())
+    ['http://mysite.com/rel/widgets']
+
+A document only hashes again the relations that changed since the tree was
+last used.
+
+The remote end of :py:func:`diff` and :py:func:`sync` only needs the
+:py:meth:`MerkleTree.hashes`, :py:meth:`MerkleTree.buckets` and
+:py:meth:`MerkleTree.resources` methods, so it can be a proxy that forwards
+them to another node.
+"""
+
+import copy
+import hashlib
+
+import jsonhome
+
+FANOUT = 16
+"""The number of children of each node in the tree."""
+
+DEPTH = 2
+"""The number of levels below the root. The last level are the buckets."""
+
+BUCKETS = FANOUT ** DEPTH
+
+
+def _bucket(relation):
+    # every process must assign the same buckets.
+    return jsonhome._stable_hash(relation) % BUCKETS
+
+
+def _hash(data):
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def _empty_levels():
+    """The hashes of each level of a tree with no relations."""
+    levels = []
+    node = _hash('')
+
+    for level in range(DEPTH, -1, -1):
+        levels.insert(0, [node] * (FANOUT ** level))
+        node = _hash(node * FANOUT)
+
+    return levels
+
+
+class MerkleTree(object):
+    """A Merkle tree over the relations of a document.
+
+    Use :py:meth:`jsonhome.Document.merkle_tree` rather than creating these
+    directly.
+
+    :param document: The document to hash.
+    :type document: :py:class:`jsonhome.Document`
+    """
+
+    def __init__(self, document):
+        self._document = document
+
+        # relation: (id of the resource, fingerprint)
+        self._entries = {}
+        # id of a resource: the relations it was hashed for
+        self._owners = {}
+        self._buckets = [{} for i in range(BUCKETS)]
+        self._levels = _empty_levels()
+
+        self._dirty = set()
+        self._rebuild = True
+
+    def _mark(self, relations=None, resource=None):
+        """Record that relations need to be hashed again.
+
+        See :py:meth:`jsonhome.Document._changed` for the arguments.
+        """
+        if relations is None and resource is None:
+            self._rebuild = True
+            return
+
+        self._dirty.update(relations or ())
+
+        if resource is not None:
+            self._dirty.update(self._owners.get(id(resource), ()))
+
+    def _refresh(self):
+        if self._rebuild:
+            self._dirty.update(self._document)
+            self._dirty.update(self._entries)
+            self._rebuild = False
+
+        if not self._dirty:
+            return
+
+        changed = set()
+
+        for relation in self._dirty:
+            index = _bucket(relation)
+            bucket = self._buckets[index]
+            changed.add(index)
+
+            old = self._entries.pop(relation, None)
+            if old is not None:
+                owned = self._owners[old[0]]
+                owned.discard(relation)
+                if not owned:
+                    del self._owners[old[0]]
+
+            resource = dict.get(self._document, relation)
+
+            if resource is None:
+                bucket.pop(relation, None)
+                continue
+
+            if isinstance(resource, jsonhome.Resource):
+                fingerprint = resource.fingerprint()
+            else:
+                fingerprint = jsonhome._fingerprint(resource)
+
+            bucket[relation] = fingerprint
+            self._entries[relation] = (id(resource), fingerprint)
+            self._owners.setdefault(id(resource), set()).add(relation)
+
+        self._dirty = set()
+
+        leaves = self._levels[DEPTH]
+        for index in changed:
+            bucket = self._buckets[index]
+            leaves[index] = _hash(''.join('%s\0%s\n' % (r, bucket[r])
+                                          for r in sorted(bucket)))
+
+        for level in range(DEPTH - 1, -1, -1):
+            children = self._levels[level + 1]
+            nodes = self._levels[level]
+            changed = set(index // FANOUT for index in changed)
+
+            for index in changed:
+                start = index * FANOUT
+                nodes[index] = _hash(''.join(children[start:start + FANOUT]))
+
+    @property
+    def root(self):
+        """The hash of the whole document."""
+        self._refresh()
+        return self._levels[0][0]
+
+    def hashes(self, level, indexes):
+        """Fetch the hashes of nodes in the tree.
+
+        :param int level: The level of the nodes, 0 is the root and
+            :py:data:`DEPTH` is the buckets.
+        :param list indexes: The positions of the nodes within the level.
+
+        :rtype: list(str)
+        """
+        self._refresh()
+        nodes = self._levels[level]
+        return [nodes[i] for i in indexes]
+
+    def buckets(self, indexes):
+        """Fetch the contents of buckets.
+
+        :param list indexes: The positions of the buckets.
+
+        :returns: A dict of relation to resource fingerprint for each bucket.
+        :rtype: list(dict)
+        """
+        self._refresh()
+        return [dict(self._buckets[i]) for i in indexes]
+
+    def resources(self, relations):
+        """Fetch copies of resources to send to another node.
+
+        :param list relations: The relations to fetch.
+
+        :returns: A dict of relation to resource data or None if the relation
+            is not in the document.
+        :rtype: dict
+        """
+        result = {}
+
+        for relation in relations:
+            resource = dict.get(self._document, relation)
+            if resource is not None:
+                resource = copy.deepcopy(dict(resource))
+            result[relation] = resource
+
+        return result
+
+
+def diff(local, remote):
+    """Find the relations that are different between two trees.
+
+    Only the parts of the trees that are different are compared. This takes
+    one call of :py:meth:`MerkleTree.hashes` for each level of the tree and
+    one call of :py:meth:`MerkleTree.buckets` on each tree.
+
+    :param local: The tree of a local document.
+    :type local: :py:class:`MerkleTree`
+    :param remote: The tree of the other document, or a proxy for it.
+
+    :returns: The sorted relations that are in either document and are
+        missing or different in the other.
+    :rtype: list(str)
+    """
+    indexes = [0]
+
+    for level in range(DEPTH + 1):
+        ours = local.hashes(level, indexes)
+        theirs = remote.hashes(level, indexes)
+        indexes = [i for i, a, b in zip(indexes, ours, theirs) if a != b]
+
+        if not indexes:
+            return []
+
+        if level < DEPTH:
+            indexes = [i * FANOUT + j
+                       for i in indexes
+                       for j in range(FANOUT)]
+
+    relations = set()
+
+    for ours, theirs in zip(local.buckets(indexes), remote.buckets(indexes)):
+        relations.update(r for r in set(ours).union(theirs)
+                         if ours.get(r) != theirs.get(r))
+
+    return sorted(relations)
+
+
+def sync(document, remote):
+    """Update a document to match another.
+
+    :param document: The document to update.
+    :type document: :py:class:`jsonhome.Document`
+    :param remote: The tree of the document to copy, or a proxy for it.
+
+    :returns: The relations that were changed.
+    :rtype: list(str)
+    """
+    relations = diff(document.merkle_tree(), remote)
+
+    for relation, data in remote.resources(relations).items():
+        document.pop(relation, None)
+
+        if data is not None:
+            document[relation] = document.resource_class(data)
+
+    return relations
@@ -0,0 +1,377 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Immutable revisions of a json-home document.
+
+A service may need to keep many revisions of its home document available at
+once, for example one per API version. Each :py:class:`Revision` is
+immutable and a new revision is derived from an existing one through a
+:py:class:`Draft`::
+
+    >>> v1 = revision.Revision(doc)
+
+    >>> draft = v1.derive()
+    >>> draft.add_resource('http://mysite.com/rel/gadgets', href='/gadgets')
+    >>> draft.edit('http://mysite.com/rel/widgets').allow_delete = True
+    >>> v2 = draft.publish()
+
+Revisions share every resource that was not changed with the revision they
+were derived from. The relations themselves are stored in a persistent hash
+trie, so deriving a revision only copies the few trie nodes on the path to
+each changed relation rather than the whole relation mapping.
+"""
+
+import copy
+
+try:
+    from collections import abc as collections_abc
+except ImportError:  # python 2
+    import collections as collections_abc
+
+import jsonhome
+
+
+_BITS = 5
+_WIDTH = 1 << _BITS
+_MASK = _WIDTH - 1
+_HASH_BITS = 32
+_BUCKET_SIZE = 8
+
+
+def _hash(relation):
+    if not isinstance(relation, jsonhome._string_types):
+        raise TypeError('Relations must be strings')
+
+    # revisions iterate in the same order in every process.
+    return jsonhome._stable_hash(relation)
+
+
+class _Node(object):
+    """An immutable trie node with a slot for each hash fragment.
+
+    A slot is either None, a child node or a bucket tuple of
+    (hash, relation, resource) entries.
+    """
+
+    __slots__ = ('slots',)
+
+    def __init__(self, slots):
+        self.slots = slots
+
+
+_EMPTY = _Node((None,) * _WIDTH)
+
+
+def _lookup(node, h, relation):
+    shift = 0
+
+    while True:
+        entry = node.slots[(h >> shift) & _MASK]
+
+        if type(entry) is _Node:
+            node = entry
+            shift += _BITS
+            continue
+
+        for _, key, value in entry or ():
+            if key == relation:
+                return value
+
+        raise KeyError(relation)
+
+
+def _replace_slot(node, index, entry):
+    slots = list(node.slots)
+    slots[index] = entry
+    return _Node(tuple(slots))
+
+
+def _assoc(node, shift, h, relation, resource):
+    """Return a copy of node with relation set to resource."""
+    index = (h >> shift) & _MASK
+    entry = node.slots[index]
+
+    if entry is None:
+        new = ((h, relation, resource),)
+
+    elif type(entry) is _Node:
+        new = _assoc(entry, shift + _BITS, h, relation, resource)
+
+    else:
+        bucket = list(entry)
+
+        for i, (_, key, _) in enumerate(bucket):
+            if key == relation:
+                bucket[i] = (h, relation, resource)
+                break
+        else:
+            bucket.append((h, relation, resource))
+
+        if len(bucket) > _BUCKET_SIZE and shift + _BITS < _HASH_BITS:
+            new = _EMPTY
+            for entry_h, key, value in bucket:
+                new = _assoc(new, shift + _BITS, entry_h, key, value)
+        else:
+            new = tuple(bucket)
+
+    return _replace_slot(node, index, new)
+
+
+def _dissoc(node, shift, h, relation):
+    """Return a copy of node without relation, or None if it is empty."""
+    index = (h >> shift) & _MASK
+    entry = node.slots[index]
+
+    if entry is None:
+        raise KeyError(relation)
+
+    if type(entry) is _Node:
+        new = _dissoc(entry, shift + _BITS, h, relation)
+
+    else:
+        new = tuple(e for e in entry if e[1] != relation)
+
+        if len(new) == len(entry):
+            raise KeyError(relation)
+
+    node = _replace_slot(node, index, new or None)
+    return node if any(node.slots) else None
+
+
+def _iterate(node):
+    for entry in node.slots:
+        if type(entry) is _Node:
+            for item in _iterate(entry):
+                yield item
+
+        elif entry:
+            for _, key, value in entry:
+                yield key, value
+
+
+class _Relations(collections_abc.Mapping):
+    """The relation mapping shared by revisions and drafts."""
+
+    def __init__(self, root, length, base_uri):
+        self._root = root
+        self._length = length
+        self.base_uri = base_uri
+
+    def __getitem__(self, relation):
+        return _lookup(self._root, _hash(relation), relation)
+
+    def __iter__(self):
+        for relation, _ in _iterate(self._root):
+            yield relation
+
+    def __len__(self):
+        return self._length
+
+    def items(self):
+        return list(_iterate(self._root))
+
+    def get_uri(self, relation, **kwargs):
+        """Get the URI for a resource.
+
+        See :py:meth:`jsonhome.Document.get_uri`.
+        """
+        try:
+            res = self[relation]
+        except KeyError:
+            raise jsonhome.UnknownResource(relation)
+
+        if self.base_uri:
+            return res.get_absolute_uri(self.base_uri, **kwargs)
+
+        return res.get_uri(**kwargs)
+
+    def to_dict(self):
+        """Convert into a serializable format.
+
+        :rtype: dict
+        """
+        return {'resources': copy.deepcopy(dict(self.items()))}
+
+    def to_json(self, **kwargs):
+        """Convert into JSON format.
+
+        :param kwargs: Formatting arguments as accepted by
+            :py:func:`json.dumps`.
+
+        :rtype: str
+        """
+        return jsonhome._dump_resources(self.items(), kwargs)
+
+    def to_document(self):
+        """Create a modifiable document with a copy of every resource.
+
+        :rtype: :py:class:`jsonhome.Document`
+        """
+        return jsonhome.Document(((r, copy.copy(v)) for r, v in self.items()),
+                                 base_uri=self.base_uri)
+
+
+class Revision(_Relations):
+    """An immutable revision of a json-home document.
+
+    The resources of a revision are read-only, modifying them raises
+    :py:class:`jsonhome.ReadOnly`. Use :py:meth:`derive` to create a new
+    revision with changes.
+
+    :param document: The document to create the first revision from. The
+        resources are copied so the document can continue to be modified.
+    :type document: :py:class:`jsonhome.Document`
+    :param str base_uri: The URI relative resource URIs are resolved against.
+        Defaults to the base_uri of document.
+    """
+
+    def __init__(self, document=None, base_uri=None):
+        root = _EMPTY
+        length = 0
+
+        for relation, resource in (document or {}).items():
+            resource = jsonhome.Resource(copy.deepcopy(dict(resource)))
+            resource._freeze()
+            root = _assoc(root, 0, _hash(relation), relation, resource)
+            length += 1
+
+        if base_uri is None:
+            base_uri = getattr(document, 'base_uri', None)
+
+        super(Revision, self).__init__(root, length, base_uri)
+
+        self.parent = None
+        """The revision that this revision was derived from."""
+
+        self.number = 0
+        """The number of revisions between this one and the first."""
+
+    def derive(self):
+        """Start a new revision based on this one.
+
+        :rtype: :py:class:`Draft`
+        """
+        return Draft(self)
+
+
+class Draft(_Relations, collections_abc.MutableMapping):
+    """The changes to a revision that will make up the next revision.
+
+    Unlike a :py:class:`jsonhome.Document`, setting a relation on a draft
+    replaces any existing resource with that relation.
+
+    :param parent: The revision the draft is based on. After publishing this is
+        the published revision.
+    :type parent: :py:class:`Revision`
+    """
+
+    def __init__(self, parent):
+        super(Draft, self).__init__(parent._root,
+                                    parent._length,
+                                    parent.base_uri)
+        self.parent = parent
+        # relation: the resource the draft created for it. The resources are
+        # held so that they are compared by identity, an id can be reused.
+        self._created = {}
+        self._changed = set()
+
+    def __setitem__(self, relation, resource):
+        if not isinstance(resource, jsonhome.Resource):
+            raise TypeError('Can only set valid resources on Draft')
+
+        h = _hash(relation)
+
+        try:
+            _lookup(self._root, h, relation)
+        except KeyError:
+            self._length += 1
+
+        self._root = _assoc(self._root, 0, h, relation, resource)
+        self._changed.add(relation)
+
+    def __delitem__(self, relation):
+        self._root = _dissoc(self._root, 0, _hash(relation), relation)
+        self._root = self._root or _EMPTY
+        self._length -= 1
+        self._changed.discard(relation)
+
+    def _create(self, relation, resource):
+        self[relation] = resource
+        self._created[relation] = resource
+        return resource
+
+    def add_resource(self, relation, **kwargs):
+        """Create a new resource on the draft.
+
+        See :py:meth:`jsonhome.Document.add_resource` for the arguments.
+
+        :raises jsonhome.ResourceAlreadyExists: If there is already a relation
+            with the requested name.
+
+        :rtype: :py:class:`jsonhome.Resource`
+        """
+        if relation in self:
+            raise jsonhome.ResourceAlreadyExists(relation)
+
+        return self._create(relation, jsonhome.Resource.create(**kwargs))
+
+    def edit(self, relation):
+        """Fetch a modifiable copy of a resource.
+
+        The copy replaces the resource in the draft. Calling edit again for
+        the same relation returns the same copy.
+
+        :rtype: :py:class:`jsonhome.Resource`
+        """
+        resource = self[relation]
+
+        if self._created.get(relation) is resource:
+            return resource
+
+        return self._create(relation, copy.copy(resource))
+
+    def publish(self):
+        """Create an immutable revision from the draft.
+
+        Resources that were created by the draft are frozen, any other
+        resources that were set on the draft are copied first so they can
+        still be modified by their original owner.
+
+        :rtype: :py:class:`Revision`
+        """
+        root = self._root
+
+        for relation in self._changed:
+            h = _hash(relation)
+            resource = _lookup(root, h, relation)
+
+            if resource._frozen:
+                continue
+
+            if self._created.get(relation) is not resource:
+                resource = copy.copy(resource)
+                root = _assoc(root, 0, h, relation, resource)
+
+            resource._freeze()
+
+        revision = Revision.__new__(Revision)
+        _Relations.__init__(revision, root, self._length, self.base_uri)
+        revision.parent = self.parent
+        revision.number = self.parent.number + 1
+
+        # the draft may continue to be used but anything it created is now
+        # part of the published revision, which the next one will follow.
+        self.parent = revision
+        self._root = root
+        self._created = {}
+        self._changed = set()
+        return revision
@@ -0,0 +1,223 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import jsonhome
+from jsonhome import cli
+from jsonhome.tests import base
+
+
+class CliTests(base.TestCase):
+
+    def setUp(self):
+        super(CliTests, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+        self.stdout = io.StringIO()
+        self.stderr = io.StringIO()
+        self.patch(sys, 'stdout', self.stdout)
+        self.patch(sys, 'stderr', self.stderr)
+
+    def _write(self, name, data):
+        path = os.path.join(self.dir, name)
+
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as f:
+            f.write(data if isinstance(data, str) else json.dumps(data))
+
+        return path
+
+    def _document(self, name, *relations):
+        doc = jsonhome.Document()
+
+        for relation in relations:
+            doc.add_resource(relation,
+                             uri='/%s{/id}' % relation,
+                             uri_vars={'id': 'param/id'},
+                             allow_get=True)
+
+        return self._write(name, doc.to_json())
+
+    def _main(self, *args):
+        return cli.main(['--jobs', '1'] + list(args))
+
+    def test_validate(self):
+        self._document('a.json', 'widgets')
+        self._document('sub/b.json', 'gadgets')
+        self._write('sub/ignored.txt', 'not a document')
+        self._write('sub/c.json', {'resources': {'x': {}, 'y': []}})
+        self._write('d.json', '{')
+
+        self.assertEqual(1, self._main('validate', self.dir))
+        self.assertEqual('', self.stdout.getvalue())
+
+        errors = self.stderr.getvalue().splitlines()
+        self.assertEqual(2, len(errors))
+        self.assertTrue(errors[0].startswith(os.path.join(self.dir, 'd.json')))
+        self.assertIn('x: resource must have one of href', errors[1])
+        self.assertIn('y: resource must be an object', errors[1])
+
+    def test_validate_valid(self):
+        path = self._document('a.json', 'widgets')
+        self.assertEqual(0, self._main('validate', path))
+
+    def test_format(self):
+        path = self._document('a.json', 'widgets')
+
+        with open(path) as f:
+            expected = jsonhome.Document.from_json(f.read())
+
+        self.assertEqual(0, self._main('format', path))
+        self.assertEqual(expected.to_json(indent=4, sort_keys=True) + '\n',
+                         self.stdout.getvalue())
+
+    def test_format_canonical_in_place(self):
+        path = self._document('a.json', 'widgets', 'gadgets')
+
+        self.assertEqual(0, self._main('format', '--canonical', '-i', path))
+        self.assertEqual('', self.stdout.getvalue())
+
+        with open(path) as f:
+            text = f.read()
+
+        self.assertEqual(json.dumps(json.loads(text),
+                                    sort_keys=True,
+                                    separators=(',', ':')) + '\n',
+                         text)
+
+    def test_convert_yaml(self):
+        try:
+            import yaml
+        except ImportError:
+            self.skipTest('PyYAML is not installed')
+
+        path = self._document('a.json', 'widgets')
+        out = os.path.join(self.dir, 'out')
+        os.mkdir(out)
+
+        self.assertEqual(0, self._main('convert', '--to', 'yaml', '-d', out,
+                                       path))
+
+        with open(os.path.join(out, 'a.yaml')) as f:
+            data = yaml.safe_load(f)
+
+        with open(path) as f:
+            self.assertEqual(json.load(f), data)
+
+        self.assertEqual('%s: %s\n' % (path, os.path.join(out, 'a.yaml')),
+                         self.stdout.getvalue())
+
+        # and back again
+        self.stdout.seek(0)
+        self.stdout.truncate()
+        self.assertEqual(0, self._main('convert',
+                                       os.path.join(out, 'a.yaml')))
+        self.assertEqual(data, json.loads(self.stdout.getvalue()))
+
+    def test_convert_keeps_relative_paths(self):
+        self._document('api/a/home.json', 'widgets')
+        self._document('api/b/home.json', 'gadgets')
+        out = os.path.join(self.dir, 'out')
+
+        self.assertEqual(0, self._main('convert', '-d', out,
+                                       os.path.join(self.dir, 'api')))
+
+        for name, relation in (('a', 'widgets'), ('b', 'gadgets')):
+            with open(os.path.join(out, name, 'home.json')) as f:
+                self.assertEqual([relation], list(json.load(f)['resources']))
+
+    def test_convert_conflicting_targets(self):
+        a = self._document('a/home.json', 'widgets')
+        b = self._document('b/home.json', 'gadgets')
+        out = os.path.join(self.dir, 'out')
+
+        self.assertEqual(1, self._main('convert', '-d', out, a, b))
+        self.assertIn('would both be written to', self.stderr.getvalue())
+        self.assertFalse(os.path.exists(out))
+
+        self.assertEqual(1, self._main('convert', '-d', self.dir, self.dir))
+        self.assertIn('would overwrite the input', self.stderr.getvalue())
+
+        with open(a) as f:
+            self.assertEqual(['widgets'], list(json.load(f)['resources']))
+
+    def test_merge(self):
+        self._document('a.json', 'widgets', 'shared')
+        self._document('b.json', 'gadgets', 'shared')
+        output = os.path.join(self.dir, 'merged.out')
+
+        self.assertEqual(0, self._main('merge', '-o', output,
+                                       os.path.join(self.dir, 'a.json'),
+                                       os.path.join(self.dir, 'b.json')))
+
+        with open(output) as f:
+            doc = jsonhome.Document.from_json(f.read())
+
+        self.assertEqual(set(['widgets', 'gadgets', 'shared']), set(doc))
+
+    def test_merge_conflict(self):
+        self._document('a.json', 'widgets')
+        self._write('b.json', {'resources': {'widgets': {'href': '/w'}}})
+
+        self.assertEqual(1, self._main('merge', self.dir))
+        self.assertEqual('', self.stdout.getvalue())
+        self.assertIn('widgets conflicts with', self.stderr.getvalue())
+
+    def test_bench(self):
+        path = self._document('a.json', 'widgets', 'gadgets')
+
+        self.assertEqual(0, self._main('bench', '-n', '2', path))
+
+        output = self.stdout.getvalue()
+        self.assertTrue(output.startswith(path + ': '))
+
+        for name in ('from_json', 'to_json', 'get_uri'):
+            self.assertIn(name, output)
+
+    def test_process_pool(self):
+        paths = [self._document('%d.json' % i, 'r%d' % i) for i in range(5)]
+        paths.append(self._write('bad.json', '[]'))
+
+        results = list(cli._process(cli._parse, paths, jobs=2, chunksize=2))
+
+        self.assertEqual(paths, [r.path for r in results])
+        self.assertEqual(['r%d' % i for i in range(5)],
+                         [list(r.data['resources'])[0] for r in results[:5]])
+        self.assertEqual('document must be an object', results[5].error)
+
+    def test_scale(self):
+        path = self._document('a.json', 'widgets', 'gadgets')
+
+        self.assertEqual(0, cli.main(['scale', '-w', '2', '-n', '5', path]))
+
+        lines = self.stdout.getvalue().splitlines()
+        self.assertEqual(['threads 1', 'threads 2',
+                          'processes 1', 'processes 2'],
+                         [line.split(':')[0] for line in lines])
+        self.assertTrue(lines[0].endswith('calls/s 1.00x'))
+
+    def test_scale_is_allowed(self):
+        path = self._document('a.json', 'widgets')
+
+        self.assertEqual(0, cli.main(['scale', '--mode', 'threads',
+                                      '--operation', 'is_allowed',
+                                      '-w', '1', '-n', '5', path]))
+        self.assertEqual(1, len(self.stdout.getvalue().splitlines()))
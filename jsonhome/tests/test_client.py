@@ -0,0 +1,270 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import errno
+import json
+import socket
+import threading
+import time
+
+try:
+    from http import client as http_client
+    from http import server as http_server
+except ImportError:  # python 2
+    import BaseHTTPServer as http_server
+    import httplib as http_client
+
+import jsonhome
+from jsonhome import client
+from jsonhome.tests import base
+
+
+class _Handler(http_server.BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def _respond(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        self.server.requests.append({'method': self.command,
+                                     'path': self.path,
+                                     'headers': dict(self.headers.items()),
+                                     'body': body,
+                                     'client': self.client_address})
+
+        if len(self.server.requests) in self.server.delayed:
+            time.sleep(0.3)
+
+        data = json.dumps({'method': self.command}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+        # close the connection without telling the client, like a server
+        # dropping an idle connection.
+        self.close_connection = self.server.drop
+
+    do_DELETE = do_GET = do_HEAD = do_PATCH = do_POST = do_PUT = _respond
+
+    def log_message(self, *args):
+        pass
+
+
+class SessionTests(base.TestCase):
+
+    def setUp(self):
+        super(SessionTests, self).setUp()
+
+        self.server = http_server.HTTPServer(('127.0.0.1', 0), _Handler)
+        self.server.requests = []
+        self.server.delayed = set()
+        self.server.drop = False
+        thread = threading.Thread(target=self.server.serve_forever,
+                                  kwargs={'poll_interval': 0.01})
+        thread.daemon = True
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        self.doc = jsonhome.Document(base_uri='http://127.0.0.1:%d/' %
+                                     self.server.server_port)
+        self.doc.add_resource('widgets',
+                              uri='/widgets{/widget_id}{?q}',
+                              uri_vars={'widget_id': 'param/widget',
+                                        'q': 'param/query'},
+                              allow_get=True,
+                              allow_post=True,
+                              allow_patch=True,
+                              accept_post=['text/plain',
+                                           'application/vnd.widget+json'],
+                              accept_patch=['application/merge-patch+json'],
+                              accept_ranges=['bytes'])
+        self.doc.add_resource('anything', href='/anything')
+
+        self.session = client.Session(self.doc)
+        self.addCleanup(self.session.close)
+
+    def test_get(self):
+        resp = self.session.get('widgets', widget_id='1234', q='a b')
+
+        self.assertEqual(200, resp.status)
+        self.assertEqual({'method': 'GET'}, resp.json())
+        self.assertEqual('application/json', resp.headers['content-type'])
+        self.assertEqual('/widgets/1234?q=a%20b',
+                         self.server.requests[0]['path'])
+
+    def test_connections_reused(self):
+        self.session.get('widgets')
+        self.session.post('widgets', body={'a': 1})
+        self.session.patch('widgets', widget_id=1, body='{}')
+
+        clients = set(r['client'] for r in self.server.requests)
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(1, len(clients))
+
+    def _pool(self):
+        return self.session._pool('http', '%s:%d' % self.server.server_address)
+
+    def test_closed_connection_not_reused(self):
+        self.session.get('widgets')
+        self._pool()._idle[0].sock.close()
+
+        self.assertEqual(200, self.session.get('widgets').status)
+
+    def test_dropped_connection_not_reused(self):
+        self.server.drop = True
+        self.session.post('widgets', body={'a': 1})
+        time.sleep(0.05)
+
+        self.assertEqual(200, self.session.post('widgets', body={}).status)
+        self.assertEqual(2, len(self.server.requests))
+
+    def _reset_connection(self, error):
+        pool = self._pool()
+
+        class _Connection(http_client.HTTPConnection):
+            def request(self, *args, **kwargs):
+                raise error
+
+        connection = _Connection(pool.netloc)
+        self.patch(client, '_is_dropped', lambda c: False)
+        pool.put(connection)
+
+    def test_reset_idempotent_retried(self):
+        self._reset_connection(client._DISCONNECTED(''))
+        self.assertEqual(200, self.session.get('widgets').status)
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_reset_post_not_retried(self):
+        self._reset_connection(socket.error(errno.ECONNRESET, 'reset'))
+        self.assertRaises(socket.error,
+                          self.session.post,
+                          'widgets',
+                          body={})
+        self.assertEqual([], self.server.requests)
+
+    def test_timeout_not_retried(self):
+        self._reset_connection(socket.timeout())
+        self.assertRaises(socket.timeout, self.session.get, 'widgets')
+        self.assertEqual([], self.server.requests)
+
+    def test_timed_out_post_sent_once(self):
+        self.server.delayed.add(2)
+        session = client.Session(self.doc, timeout=0.1)
+        self.addCleanup(session.close)
+
+        session.post('widgets', body={'a': 1})
+        self.assertRaises(socket.timeout,
+                          session.post,
+                          'widgets',
+                          body={'a': 2})
+
+        # give the server time to handle a retry if one was sent.
+        time.sleep(0.4)
+        self.assertEqual(['POST', 'POST'],
+                         [r['method'] for r in self.server.requests])
+
+    def test_json_content_type_from_hints(self):
+        self.session.post('widgets', body={'name': 'sprocket'})
+
+        request = self.server.requests[0]
+        self.assertEqual('application/vnd.widget+json',
+                         request['headers']['Content-Type'])
+        self.assertEqual({'name': 'sprocket'},
+                         json.loads(request['body'].decode('utf-8')))
+
+    def test_content_type_from_hints(self):
+        self.session.post('widgets', body='sprocket')
+        self.session.patch('widgets', body='{}')
+
+        self.assertEqual('text/plain',
+                         self.server.requests[0]['headers']['Content-Type'])
+        self.assertEqual('application/merge-patch+json',
+                         self.server.requests[1]['headers']['Content-Type'])
+
+    def test_content_type_matches_media_type(self):
+        for content_type in ('text/plain; charset=utf-8',
+                             'Application/VND.Widget+JSON'):
+            method, uri, headers, body = self.session.prepare(
+                'POST', 'widgets', body='{}', content_type=content_type)
+
+            self.assertEqual(content_type, headers['Content-Type'])
+
+        self.assertRaises(jsonhome.UnsupportedMediaType,
+                          self.session.prepare,
+                          'POST',
+                          'widgets',
+                          body='{}',
+                          content_type='text/html; charset=text/plain')
+
+    def test_content_type_without_hints(self):
+        self.session.put('anything', body=[1, 2])
+        self.session.delete('anything', body=b'raw')
+
+        self.assertEqual('application/json',
+                         self.server.requests[0]['headers']['Content-Type'])
+        self.assertNotIn('Content-Type', self.server.requests[1]['headers'])
+
+    def test_rejected_without_request(self):
+        self.assertRaises(jsonhome.MethodNotAllowed,
+                          self.session.delete,
+                          'widgets')
+        self.assertRaises(jsonhome.UnsupportedMediaType,
+                          self.session.post,
+                          'widgets',
+                          body='{}',
+                          content_type='application/json')
+        self.assertRaises(jsonhome.UnsupportedMediaType,
+                          self.session.patch,
+                          'widgets',
+                          body='{}',
+                          headers={'content-type': 'application/json'})
+        self.assertRaises(jsonhome.RangeNotSupported,
+                          self.session.get,
+                          'widgets',
+                          headers={'Range': 'items=0-9'})
+        self.assertRaises(jsonhome.UnknownResource,
+                          self.session.get,
+                          'gadgets')
+
+        self.assertEqual([], self.server.requests)
+        self.assertEqual({}, self.session._pools)
+
+    def test_prepare_does_not_modify_document(self):
+        self.session.prepare('DELETE', 'anything', body={})
+        self.assertEqual({'href': '/anything'}, self.doc['anything'])
+
+    def test_range_allowed(self):
+        self.session.get('widgets', headers={'Range': 'bytes=0-9'})
+        self.assertEqual('bytes=0-9',
+                         self.server.requests[0]['headers']['Range'])
+
+    def test_range_unit_case_insensitive(self):
+        self.doc.add_resource('gadgets', href='/gadgets',
+                              accept_ranges=['Bytes'])
+
+        for unit in ('bytes', 'BYTES'):
+            method, uri, headers, body = self.session.prepare(
+                'GET', 'gadgets', headers={'Range': '%s=0-9' % unit})
+
+            self.assertEqual('%s=0-9' % unit, headers['Range'])
+
+    def test_relative_uri(self):
+        self.doc.base_uri = None
+        self.assertRaises(jsonhome.MissingValues,
+                          self.session.get,
+                          'anything')
@@ -10,7 +10,11 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import io
+import json
+
 import jsonhome
+from jsonhome import _template
 from jsonhome.tests import base
 
 
@@ -222,3 +226,388 @@ class DocumentTests(base.TestCase):
         self.assertRaises(TypeError, _f, 'relation', 'somestring')
         self.assertRaises(TypeError, _f, 'relation', 42)
         self.assertRaises(TypeError, _f, 'relation', ['list', 'of', 'stuff'])
+
+    def test_base_uri_href(self):
+        self.doc.base_uri = 'http://example.com/api/'
+        r = self.doc.add_resource('relation', href='widgets')
+
+        self.assertEqual('widgets', r.get_uri())
+        self.assertEqual('http://example.com/api/widgets',
+                         self.doc.get_uri('relation'))
+
+        r.href = '/gadgets'
+        self.assertEqual('http://example.com/gadgets',
+                         self.doc.get_uri('relation'))
+
+        self.doc.base_uri = 'https://other.example.com/'
+        self.assertEqual('https://other.example.com/gadgets',
+                         self.doc.get_uri('relation'))
+
+    def test_base_uri_template(self):
+        self.doc.base_uri = 'http://example.com/api/'
+        self.doc.add_resource('relation',
+                              uri='widgets/{widget_id}{?q}',
+                              uri_vars={'widget_id': 'param/widget',
+                                        'q': 'param/q'})
+
+        self.assertEqual('http://example.com/api/widgets/1234',
+                         self.doc.get_uri('relation', widget_id='1234'))
+        self.assertEqual('http://example.com/api/widgets/5?q=a%20b',
+                         self.doc.get_uri('relation', widget_id=5, q='a b'))
+
+    def test_base_uri_template_without_prefix(self):
+        self.doc.base_uri = 'http://example.com/api/'
+        self.doc.add_resource('relation',
+                              uri='{+path}',
+                              uri_vars={'path': 'param/path'})
+
+        self.assertEqual('http://example.com/widgets/1',
+                         self.doc.get_uri('relation', path='../widgets/1'))
+
+    def test_base_uri_absolute_template(self):
+        self.doc.base_uri = 'http://example.com/api/'
+        self.doc.add_resource('relation',
+                              uri='http://other.example.com{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'})
+
+        self.assertEqual('http://other.example.com/1',
+                         self.doc.get_uri('relation', widget_id='1'))
+
+    def test_base_uri_from_json(self):
+        data = '{"resources": {"relation": {"href": "/widgets"}}}'
+        d = jsonhome.Document.from_json(data,
+                                        base_uri='http://example.com/home')
+
+        self.assertEqual('http://example.com/home', d.base_uri)
+        self.assertEqual('http://example.com/widgets', d.get_uri('relation'))
+        self.assertEqual(data, d.to_json())
+
+    def test_uri_cache_disabled_by_default(self):
+        self.doc.add_resource('relation', href='/widgets')
+        self.assertEqual('/widgets', self.doc.get_uri('relation'))
+        self.assertIsNone(self.doc.uri_cache_info())
+
+    def test_uri_cache_hits(self):
+        self.doc.enable_uri_cache(maxsize=10)
+        self.doc.add_resource('relation',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'})
+
+        for i in range(3):
+            self.assertEqual('/widgets/1',
+                             self.doc.get_uri('relation', widget_id='1'))
+        self.assertEqual('/widgets/2',
+                         self.doc.get_uri('relation', widget_id='2'))
+
+        info = self.doc.uri_cache_info()
+        self.assertEqual(2, info.hits)
+        self.assertEqual(2, info.misses)
+        self.assertEqual(10, info.maxsize)
+        self.assertEqual(2, info.currsize)
+
+    def test_uri_cache_evicts_least_recently_used(self):
+        self.doc.enable_uri_cache(maxsize=2)
+        self.doc.add_resource('relation',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'})
+
+        self.doc.get_uri('relation', widget_id='1')
+        self.doc.get_uri('relation', widget_id='2')
+        self.doc.get_uri('relation', widget_id='1')
+        self.doc.get_uri('relation', widget_id='3')
+        self.assertEqual(2, self.doc.uri_cache_info().currsize)
+
+        self.doc.get_uri('relation', widget_id='1')
+        self.assertEqual(2, self.doc.uri_cache_info().hits)
+
+        self.doc.get_uri('relation', widget_id='2')
+        self.assertEqual(2, self.doc.uri_cache_info().hits)
+
+    def test_uri_cache_invalidated_by_resource_changes(self):
+        self.doc.enable_uri_cache()
+        r = self.doc.add_resource('relation', href='/widgets')
+        self.assertEqual('/widgets', self.doc.get_uri('relation'))
+
+        r.href = '/gadgets'
+        self.assertEqual('/gadgets', self.doc.get_uri('relation'))
+
+        r.set_uri('/things{/thing_id}', thing_id='param/thing')
+        self.assertEqual('/things/1',
+                         self.doc.get_uri('relation', thing_id='1'))
+
+        r.href_template = '/stuff{/thing_id}'
+        self.assertEqual('/stuff/1',
+                         self.doc.get_uri('relation', thing_id='1'))
+
+        r.href_vars = {'thing_id': 'param/other'}
+        self.assertEqual('/stuff/1',
+                         self.doc.get_uri('relation', thing_id='1'))
+        self.assertEqual(0, self.doc.uri_cache_info().hits)
+
+    def test_uri_cache_invalidated_by_replaced_relation(self):
+        self.doc.enable_uri_cache()
+        self.doc.add_resource('relation', href='/widgets')
+        self.assertEqual('/widgets', self.doc.get_uri('relation'))
+
+        del self.doc['relation']
+        self.assertRaises(jsonhome.UnknownResource,
+                          self.doc.get_uri,
+                          'relation')
+
+        self.doc.add_resource('relation', href='/gadgets')
+        self.assertEqual('/gadgets', self.doc.get_uri('relation'))
+
+    def test_uri_cache_invalidated_by_base_uri(self):
+        self.doc.enable_uri_cache()
+        self.doc.add_resource('relation', href='/widgets')
+        self.assertEqual('/widgets', self.doc.get_uri('relation'))
+
+        self.doc.base_uri = 'http://example.com/'
+        self.assertEqual('http://example.com/widgets',
+                         self.doc.get_uri('relation'))
+
+    def test_uri_cache_keys_include_types(self):
+        self.doc.enable_uri_cache()
+        self.doc.add_resource('relation',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'})
+
+        self.assertEqual('/widgets/1',
+                         self.doc.get_uri('relation', widget_id=1))
+        self.assertEqual('/widgets/True',
+                         self.doc.get_uri('relation', widget_id=True))
+        self.assertEqual('/widgets/1.0',
+                         self.doc.get_uri('relation', widget_id=1.0))
+        self.assertEqual(0, self.doc.uri_cache_info().hits)
+
+    def test_uri_cache_unhashable_variables(self):
+        self.doc.enable_uri_cache()
+        self.doc.add_resource('relation',
+                              uri='/widgets{/ids*}',
+                              uri_vars={'ids': 'param/ids'})
+
+        self.assertEqual('/widgets/1/2',
+                         self.doc.get_uri('relation', ids=['1', '2']))
+        self.assertEqual(0, self.doc.uri_cache_info().currsize)
+
+    def _create_resources(self):
+        self.doc.add_resource('widgets',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'},
+                              allow_get=True,
+                              accept_post=['application/json'])
+        self.doc.add_resource(u'caf\xe9', href='/caf\xe9', docs='/docs')
+        self.doc.add_resource('empty')
+        self.doc['plain'] = jsonhome.Resource({'hints': {'formats': {}}})
+
+    def test_to_json_matches_json_dumps(self):
+        self._create_resources()
+
+        for kwargs in ({},
+                       {'indent': 4},
+                       {'indent': 2, 'sort_keys': True},
+                       {'indent': '\t', 'separators': (',', ':')},
+                       {'indent': 0},
+                       {'sort_keys': True, 'separators': (', ', ': ')},
+                       {'ensure_ascii': False},
+                       {'default': str, 'sort_keys': True}):
+            self.assertEqual(json.dumps(self.doc.to_dict(), **kwargs),
+                             self.doc.to_json(**kwargs))
+
+    def test_response_headers(self):
+        self.doc.add_resource('widgets', href='/widgets', allow_get=True)
+
+        self.assertEqual((('Allow', 'GET'),),
+                         self.doc.response_headers('widgets'))
+        self.assertIs(self.doc.response_headers('widgets'),
+                      self.doc['widgets'].response_headers())
+        self.assertRaises(jsonhome.UnknownResource,
+                          self.doc.response_headers,
+                          'gadgets')
+
+    def test_iter_json_matches_to_json(self):
+        self._create_resources()
+
+        for kwargs in ({},
+                       {'indent': 4},
+                       {'indent': '\t', 'sort_keys': True},
+                       {'separators': (',', ':'), 'sort_keys': True},
+                       {'cls': json.JSONEncoder, 'indent': 2}):
+            chunks = list(self.doc.iter_json(**kwargs))
+            self.assertEqual(self.doc.to_json(**kwargs), ''.join(chunks))
+
+        self.assertEqual(len(self.doc) + 2,
+                         len(list(self.doc.iter_json(indent=4))))
+
+    def test_iter_json_empty(self):
+        for kwargs in ({}, {'indent': 4}):
+            self.assertEqual(json.dumps({'resources': {}}, **kwargs),
+                             ''.join(self.doc.iter_json(**kwargs)))
+
+    def test_iter_json_doesnt_fill_cache(self):
+        self._create_resources()
+        self.doc['widgets']._cached_json((), lambda r: '"cached"')
+
+        data = json.loads(''.join(self.doc.iter_json()))
+
+        self.assertEqual('cached', data['resources']['widgets'])
+        self.assertEqual(['widgets'],
+                         [r for r, v in self.doc.items() if v._json_cache])
+
+    def test_dump(self):
+        self._create_resources()
+        fp = io.StringIO()
+
+        self.doc.dump(fp, sort_keys=True)
+        self.assertEqual(self.doc.to_json(sort_keys=True), fp.getvalue())
+
+    def test_precompute_makes_resolution_read_only(self):
+        self.doc.base_uri = 'http://example.com/home/'
+        self.doc.add_resource('widgets',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param'},
+                              allow_get=True)
+        self.doc.add_resource('gadgets', href='gadgets')
+        self.doc.add_resource('list', uri='{/list*}', uri_vars={'list': 'p'})
+        self.doc.precompute()
+
+        state = [(r._version, r._uri_cache) for r in self.doc.values()]
+        compiled = dict(_template._compiled)
+
+        for i in range(2):
+            self.assertEqual('http://example.com/widgets/1',
+                             self.doc.get_uri('widgets', widget_id=1))
+            self.assertEqual('http://example.com/home/gadgets',
+                             self.doc.get_uri('gadgets'))
+            self.assertEqual('http://example.com/a/b',
+                             self.doc.get_uri('list', list=['a', 'b']))
+            self.assertTrue(self.doc['widgets'].is_allowed('GET'))
+            self.assertIsNone(self.doc['gadgets'].is_allowed('GET'))
+
+        for (version, cache), r in zip(state, self.doc.values()):
+            self.assertEqual(version, r._version)
+            self.assertIs(cache, r._uri_cache)
+        self.assertEqual(compiled, _template._compiled)
+
+    def test_loaded_templates_compiled_by_precompute(self):
+        doc = jsonhome.Document.from_dict(
+            {'resources': {'widgets': {'href-template': '/widgets{/id}'}}})
+        self.assertIsNone(doc['widgets']._compiled_template)
+
+        doc.precompute()
+        self.assertEqual('/widgets{/id}',
+                         doc['widgets']._compiled_template.template)
+
+    def test_to_json_empty(self):
+        for kwargs in ({}, {'indent': 4}):
+            self.assertEqual(json.dumps({'resources': {}}, **kwargs),
+                             self.doc.to_json(**kwargs))
+
+    def test_to_json_reserializes_modified_resources(self):
+        self._create_resources()
+        self.doc.to_json(sort_keys=True)
+
+        r = self.doc['widgets']
+        self.assertTrue(r._json_cache)
+        self.assertTrue(self.doc['empty']._json_cache)
+
+        r.allow.append('PUT')
+        self.assertFalse(r._json_cache)
+        self.assertTrue(self.doc['empty']._json_cache)
+        self.assertEqual(json.dumps(self.doc.to_dict(), sort_keys=True),
+                         self.doc.to_json(sort_keys=True))
+
+        self.doc['empty']['href'] = '/empty'
+        self.doc['plain'].hints['formats']['text/html'] = {}
+        self.assertEqual(json.dumps(self.doc.to_dict(), sort_keys=True),
+                         self.doc.to_json(sort_keys=True))
+
+        r.set_uri('/gadgets')
+        r.allow_get = False
+        self.assertEqual(json.dumps(self.doc.to_dict(), sort_keys=True),
+                         self.doc.to_json(sort_keys=True))
+
+    def _shared_document(self):
+        hints = {'allow': ['GET'], 'accept-ranges': ['bytes']}
+        data = {'resources': {
+            'a': {'href': '/a', 'hints': hints},
+            'b': {'href': '/b', 'hints': json.loads(json.dumps(hints))},
+            'c': {'href': '/c', 'hints': {'allow': ['GET', 'PUT']}},
+            'd': {'href': '/d'}}}
+
+        return data, jsonhome.Document.from_dict(data, share_hints=True)
+
+    def test_share_hints(self):
+        data, doc = self._shared_document()
+        a, b, c = doc['a'], doc['b'], doc['c']
+
+        self.assertEqual(jsonhome.Document.from_dict(data), doc)
+        self.assertIs(dict.get(a, 'hints'), dict.get(b, 'hints'))
+        self.assertIs(dict.get(a, 'hints')['allow'][0],
+                      dict.get(c, 'hints')['allow'][0])
+        self.assertEqual(json.dumps(data, sort_keys=True),
+                         doc.to_json(sort_keys=True))
+
+        # reading doesn't need a copy
+        self.assertTrue(a.allow_get)
+        self.assertEqual(['bytes'], dict.get(a, 'hints')['accept-ranges'])
+        self.assertIs(dict.get(a, 'hints'), dict.get(b, 'hints'))
+
+    def test_shared_hints_copied_on_write(self):
+        data, doc = self._shared_document()
+        a, b = doc['a'], doc['b']
+        before = doc.to_json(sort_keys=True)
+
+        a.allow_put = True
+        self.assertEqual(['GET', 'PUT'], a.allow)
+        self.assertEqual(['GET'], b.allow)
+
+        b.allow.append('DELETE')
+        self.assertEqual(['GET', 'DELETE'], b.allow)
+        self.assertEqual(['GET', 'PUT'], a.allow)
+
+        doc['c'].hints['docs'] = '/docs'
+        del doc['c'].accept_ranges
+        self.assertEqual({'allow': ['GET', 'PUT'], 'docs': '/docs'},
+                         doc['c'].hints)
+
+        self.assertNotEqual(before, doc.to_json(sort_keys=True))
+        self.assertEqual(json.dumps(doc.to_dict(), sort_keys=True),
+                         doc.to_json(sort_keys=True))
+
+    def test_shared_hints_copied_by_dict_access(self):
+        data, doc = self._shared_document()
+        a, b, c = doc['a'], doc['b'], doc['c']
+
+        a['hints']['allow'].append('PUT')
+        b.get('hints').pop('accept-ranges')
+        c.setdefault('hints', {})['docs'] = '/docs'
+
+        self.assertEqual(['GET', 'PUT'], a.allow)
+        self.assertEqual(['bytes'], a.accept_ranges)
+        self.assertEqual({'allow': ['GET']}, b.hints)
+        self.assertEqual({'allow': ['GET', 'PUT'], 'docs': '/docs'}, c.hints)
+        self.assertEqual(json.dumps(doc.to_dict(), sort_keys=True),
+                         doc.to_json(sort_keys=True))
+
+    def test_shared_hints_read_only(self):
+        data, doc = self._shared_document()
+
+        hints = dict(doc['a'].items())['hints']
+        self.assertRaises(jsonhome.ReadOnly, hints['allow'].append, 'PUT')
+        self.assertRaises(jsonhome.ReadOnly, hints.pop, 'allow')
+        self.assertEqual(['GET'], doc['b'].allow)
+
+        # copies are plain data that can be modified
+        copied = doc.to_dict()
+        copied['resources']['a']['hints']['allow'].append('PUT')
+        self.assertEqual(['GET'], doc['a'].allow)
+
+    def test_from_json_share_hints(self):
+        data, doc = self._shared_document()
+        loaded = jsonhome.Document.from_json(json.dumps(data),
+                                             share_hints=True)
+
+        self.assertEqual(doc, loaded)
+        self.assertIs(dict.get(loaded['a'], 'hints'),
+                      dict.get(loaded['b'], 'hints'))
@@ -0,0 +1,95 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import os
+import subprocess
+import sys
+
+from jsonhome.tests import base
+
+
+# The cumulative time in microseconds that importing jsonhome may take as
+# reported by python -X importtime. Importing jsonhome itself takes around
+# 1ms, this leaves plenty of room for slow test machines while still
+# catching an eager import of json, urllib or uritemplate.
+IMPORT_BUDGET = 20000
+
+LAZY_MODULES = ['copy',
+                'collections',
+                'json',
+                'uritemplate',
+                'urllib.parse',
+                'urlparse',
+                'weakref']
+
+
+def _python(*args):
+    # compiling jsonhome is not part of the import time being measured.
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    process = subprocess.Popen([sys.executable] + list(args),
+                               env=env,
+                               stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    stdout, stderr = process.communicate()
+
+    if process.returncode:
+        raise AssertionError(stderr)
+
+    return stdout, stderr
+
+
+class ImportTests(base.TestCase):
+
+    def _loaded_after(self, code):
+        stdout, _ = _python('-c',
+                            'import sys\n'
+                            'before = set(sys.modules)\n'
+                            '%s\n'
+                            'print(" ".join(set(sys.modules) - before))' %
+                            code)
+        return set(stdout.split())
+
+    def test_import_is_lazy(self):
+        loaded = self._loaded_after('import jsonhome')
+
+        for module in LAZY_MODULES:
+            self.assertNotIn(module, loaded)
+
+    def test_simple_templates_dont_load_uritemplate(self):
+        loaded = self._loaded_after(
+            'import jsonhome\n'
+            'd = jsonhome.Document()\n'
+            'd.add_resource("w", uri="/w{/id}", uri_vars={"id": "p"})\n'
+            'd.get_uri("w", id=1)')
+
+        self.assertNotIn('uritemplate', loaded)
+
+    def test_import_time_budget(self):
+        if sys.version_info < (3, 7):
+            self.skipTest('python -X importtime requires python 3.7')
+
+        # the first run may need to write bytecode, only time the second.
+        _python('-c', 'import jsonhome')
+        _, stderr = _python('-X', 'importtime', '-c', 'import jsonhome')
+
+        for line in stderr.splitlines():
+            # import time: self [us] | cumulative | imported package
+            fields = [f.strip() for f in line.split(':', 1)[-1].split('|')]
+
+            if fields[-1] == 'jsonhome':
+                self.assertLess(int(fields[1]), IMPORT_BUDGET)
+                break
+        else:
+            self.fail('jsonhome not found in importtime output')
@@ -0,0 +1,178 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import collections
+import json
+
+import jsonhome
+from jsonhome import merkle
+from jsonhome.tests import base
+
+
+class _Peer(object):
+    """An in-process stand in for another node.
+
+    Every call is round tripped through JSON as if it were sent over the
+    network and counted.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.calls = collections.Counter()
+
+    def _call(self, name, *args):
+        self.calls[name] += 1
+        tree = self.document.merkle_tree()
+        return json.loads(json.dumps(getattr(tree, name)(*args)))
+
+    def hashes(self, level, indexes):
+        return self._call('hashes', level, indexes)
+
+    def buckets(self, indexes):
+        return self._call('buckets', indexes)
+
+    def resources(self, relations):
+        return self._call('resources', relations)
+
+
+def _document(count=100):
+    doc = jsonhome.Document()
+
+    for i in range(count):
+        doc.add_resource('rel/%d' % i,
+                         uri='/r%d{/id}' % i,
+                         uri_vars={'id': 'param/id'},
+                         allow_get=True)
+
+    return doc
+
+
+class FingerprintTests(base.TestCase):
+
+    def test_resource_fingerprint(self):
+        a = jsonhome.Resource.create(href='/a', allow_get=True, docs='/d')
+        b = jsonhome.Resource({'hints': {'docs': '/d', 'allow': ['GET']},
+                               'href': '/a'})
+
+        self.assertEqual(a.fingerprint(), b.fingerprint())
+
+        b.allow_put = True
+        self.assertNotEqual(a.fingerprint(), b.fingerprint())
+
+        b.allow.remove('PUT')
+        self.assertEqual(a.fingerprint(), b.fingerprint())
+
+    def test_document_fingerprint(self):
+        a = _document()
+        b = jsonhome.Document.from_json(a.to_json())
+
+        self.assertEqual(a.fingerprint(), b.fingerprint())
+        self.assertNotEqual(a.fingerprint(), jsonhome.Document().fingerprint())
+
+        b['rel/5'].href_vars['id'] = 'param/other'
+        self.assertNotEqual(a.fingerprint(), b.fingerprint())
+
+    def test_fingerprint_follows_changes(self):
+        doc = _document(10)
+        empty = jsonhome.Document().fingerprint()
+        original = doc.fingerprint()
+
+        doc.add_resource('new', href='/new')
+        added = doc.fingerprint()
+        self.assertNotEqual(original, added)
+
+        doc['new'].allow_get = True
+        self.assertNotEqual(added, doc.fingerprint())
+
+        del doc['new']
+        self.assertEqual(original, doc.fingerprint())
+
+        doc.popitem()
+        doc.pop('rel/1')
+        doc.update({'rel/1': jsonhome.Resource(href='/other')})
+        self.assertNotEqual(original, doc.fingerprint())
+
+        doc.clear()
+        self.assertEqual(empty, doc.fingerprint())
+
+    def test_incremental(self):
+        doc = _document()
+        doc.fingerprint()
+
+        hashed = []
+        fingerprint = jsonhome._fingerprint
+        self.addCleanup(setattr, jsonhome, '_fingerprint', fingerprint)
+
+        def _counting(resource):
+            hashed.append(resource)
+            return fingerprint(resource)
+
+        jsonhome._fingerprint = _counting
+
+        doc['rel/3'].allow_post = True
+        doc.add_resource('new', href='/new')
+        doc.fingerprint()
+
+        self.assertEqual([doc['rel/3'], doc['new']],
+                         sorted(hashed, key=lambda r: r is doc['new']))
+
+    def test_shared_resource(self):
+        doc = jsonhome.Document()
+        r = doc.add_resource('a', href='/a')
+        doc.update({'b': r})
+        before = doc.fingerprint()
+
+        r.allow_get = True
+        self.assertNotEqual(before, doc.fingerprint())
+
+        other = jsonhome.Document({'a': jsonhome.Resource(r),
+                                   'b': jsonhome.Resource(r)})
+        self.assertEqual(other.fingerprint(), doc.fingerprint())
+
+
+class SyncTests(base.TestCase):
+
+    def setUp(self):
+        super(SyncTests, self).setUp()
+        self.local = _document()
+        self.remote = _document()
+        self.peer = _Peer(self.remote)
+
+    def test_equal(self):
+        self.assertEqual([], merkle.diff(self.local.merkle_tree(), self.peer))
+        self.assertEqual({'hashes': 1}, self.peer.calls)
+
+    def test_diff(self):
+        self.remote['rel/7'].allow_delete = True
+        self.remote.add_resource('rel/new', href='/new')
+        del self.remote['rel/50']
+        del self.local['rel/60']
+
+        self.assertEqual(['rel/50', 'rel/60', 'rel/7', 'rel/new'],
+                         merkle.diff(self.local.merkle_tree(), self.peer))
+        self.assertEqual(merkle.DEPTH + 1, self.peer.calls['hashes'])
+        self.assertEqual(1, self.peer.calls['buckets'])
+
+    def test_sync(self):
+        self.remote['rel/7'].allow_delete = True
+        self.remote.add_resource('rel/new', href='/new')
+        del self.remote['rel/50']
+        self.local['rel/8'].href_template = '/changed'
+
+        changed = merkle.sync(self.local, self.peer)
+
+        self.assertEqual(['rel/50', 'rel/7', 'rel/8', 'rel/new'], changed)
+        self.assertEqual(self.remote.fingerprint(), self.local.fingerprint())
+        self.assertEqual(self.remote, self.local)
+        self.assertIsInstance(self.local['rel/new'], jsonhome.Resource)
+
+        self.assertEqual([], merkle.sync(self.local, self.peer))
@@ -10,6 +10,8 @@
 # License for the specific language governing permissions and limitations
 # under the License.
 
+import copy
+
 import jsonhome
 from jsonhome.tests import base
 
@@ -144,3 +146,219 @@ class ResourceTests(base.TestCase):
                           jsonhome.Resource.create,
                           uri='uri-value',
                           href_template='href-template')
+
+    def test_absolute_uri_follows_href_changes(self):
+        base = 'http://example.com/api/'
+        self.res.href = 'widgets'
+        self.assertEqual('http://example.com/api/widgets',
+                         self.res.get_absolute_uri(base))
+
+        self.res['href'] = 'gadgets'
+        self.assertEqual('http://example.com/api/gadgets',
+                         self.res.get_absolute_uri(base))
+
+        self.res.set_uri('things{/thing_id}', thing_id='param/thing')
+        self.assertEqual('http://example.com/api/things/1',
+                         self.res.get_absolute_uri(base, thing_id=1))
+
+    def test_absolute_uri_keeps_dot_segments_from_template(self):
+        self.res.set_uri('/files/.{ext}', ext='param/ext')
+        self.assertEqual('http://example.com/files/.json',
+                         self.res.get_absolute_uri('http://example.com/',
+                                                   ext='json'))
+
+    def test_absolute_uri_removes_dot_segments_from_values(self):
+        base = 'http://h/api/'
+
+        self.res.set_uri('files/{+path}', path='param/path')
+        self.assertEqual('http://h/api/etc',
+                         self.res.get_absolute_uri(base, path='../etc'))
+        self.assertEqual('http://h/api/files/a/b',
+                         self.res.get_absolute_uri(base, path='a/./b'))
+        self.assertEqual('http://h/api/files/a.b?q=..',
+                         self.res.get_absolute_uri(base, path='a.b?q=..'))
+
+        self.res.set_uri('/w/{id}', id='param/id')
+        self.assertEqual('http://h/',
+                         self.res.get_absolute_uri(base, id='..'))
+        self.assertEqual('http://h/w/...',
+                         self.res.get_absolute_uri(base, id='...'))
+
+    def test_absolute_uri_not_copied(self):
+        self.res.href = 'widgets'
+        self.res.get_absolute_uri('http://example.com/')
+
+        r = copy.deepcopy(self.res)
+        self.assertEqual({'href': 'widgets'}, r)
+        self.assertIsNone(r._uri_cache)
+
+    def test_absolute_uri_cache_keeps_one_base(self):
+        self.res.href = 'widgets'
+
+        for i in range(10):
+            base = 'http://example.com/%d/' % i
+            self.assertEqual(base + 'widgets',
+                             self.res.get_absolute_uri(base))
+            self.assertEqual(base, self.res._uri_cache[0])
+
+    def test_template_compiled_on_assignment(self):
+        self.res.set_uri('/widgets{/widget_id}', widget_id='param/widget')
+        self.assertTrue(self.res._compiled_template.compiled)
+        self.assertEqual('/widgets/1', self.res.get_uri(widget_id=1))
+
+        self.res.href_template = '/gadgets{/widget_id}'
+        self.assertEqual('/gadgets{/widget_id}',
+                         self.res._compiled_template.template)
+        self.assertEqual('/gadgets/1', self.res.get_uri(widget_id=1))
+
+    def test_template_compiled_on_first_use(self):
+        r = jsonhome.Resource({'href-template': '/things{/thing_id}'})
+        self.assertIsNone(r._compiled_template)
+
+        self.assertEqual('/things/1', r.get_uri(thing_id=1))
+        self.assertEqual('/things{/thing_id}', r._compiled_template.template)
+
+    def test_template_not_compiled_falls_back(self):
+        self.res.set_uri('/widgets{/ids*}', ids='param/ids')
+        self.assertFalse(self.res._compiled_template.compiled)
+        self.assertEqual('/widgets/1/2', self.res.get_uri(ids=[1, 2]))
+
+    def _assertInvalidates(self, func):
+        version = self.res._version
+        func()
+        self.assertGreater(self.res._version, version)
+
+    def test_nested_modifications_invalidate(self):
+        self._assertInvalidates(lambda: self.res.allow.append('GET'))
+        self._assertInvalidates(lambda: self.res.allow.extend(['PUT']))
+        self._assertInvalidates(lambda: self.res.allow.remove('PUT'))
+        self._assertInvalidates(lambda: self.res.hints.update(docs='d'))
+        self._assertInvalidates(lambda: self.res['hints'].pop('docs'))
+        self._assertInvalidates(lambda: self.res.href_vars.setdefault('a'))
+        self._assertInvalidates(lambda: self.res.update(href='/widgets'))
+        self._assertInvalidates(lambda: self.res.pop('href'))
+
+        def _set_slice():
+            self.res.allow[:] = ['POST']
+
+        self._assertInvalidates(_set_slice)
+
+        self.assertEqual({'hints': {'allow': ['POST']},
+                          'href-vars': {'a': None}},
+                         self.res)
+
+    def test_assigned_containers_tracked(self):
+        formats = {'application/json': {}}
+        self.res.hints['formats'] = formats
+        self._assertInvalidates(
+            lambda: self.res.hints['formats'].update({'text/html': {}}))
+
+        self.assertEqual({'application/json': {}}, formats)
+        self.assertEqual({'application/json': {}, 'text/html': {}},
+                         self.res.hints['formats'])
+
+    def test_created_containers_tracked_on_access(self):
+        hints = {'allow': ['GET']}
+        r = jsonhome.Resource({'href': '/widgets', 'hints': hints})
+        self.assertIs(hints, dict.get(r, 'hints'))
+
+        fingerprint = r.fingerprint()
+        self.assertIsNot(hints, dict.get(r, 'hints'))
+
+        r['hints']['allow'].append('PUT')
+        self.assertNotEqual(fingerprint, r.fingerprint())
+        self.assertEqual(['GET'], hints['allow'])
+
+        r = jsonhome.Resource({'hints': {'allow': ['GET']}})
+        version = r._version
+        allow = r.allow
+        self.assertIs(r, allow._owner)
+        self.assertEqual(version, r._version)
+        self.assertEqual([r], [v._owner for v in r.values()])
+
+    def test_shallow_copy_not_shared(self):
+        self.res.allow.append('GET')
+
+        r = copy.copy(self.res)
+        r.allow.append('PUT')
+        self.assertEqual(['GET'], self.res.allow)
+        self.assertEqual(['GET', 'PUT'], r.allow)
+
+    def test_reading_unchanged_keeps_version(self):
+        self.res.allow.append('GET')
+        version = self.res._version
+
+        self.assertTrue(self.res.allow_get)
+        self.assertEqual(['GET'], self.res.allow)
+        self.assertIsNone(self.res.href)
+        self.assertEqual(version, self.res._version)
+
+    def test_reading_missing_hints_is_read_only(self):
+        self.res.href = '/widgets'
+        version = self.res._version
+
+        self.assertIsNone(self.res.is_allowed('GET'))
+        self.assertFalse(self.res.allow_get)
+        self.assertIsNone(self.res.docs)
+        self.assertEqual({'href': '/widgets'}, self.res)
+        self.assertEqual(version, self.res._version)
+
+    def test_is_allowed_case_insensitive(self):
+        self.res.hints['allow'] = ['get', 'Put']
+
+        self.assertTrue(self.res.is_allowed('GET'))
+        self.assertTrue(self.res.is_allowed('put'))
+        self.assertFalse(self.res.is_allowed('POST'))
+
+    def test_response_headers(self):
+        self.res.allow_get = True
+        self.res.allow_post = True
+        self.res.accept_post = ['application/json', 'text/plain']
+        self.res.accept_ranges = ['bytes']
+        self.res.docs = 'http://example.com/docs'
+
+        self.assertEqual(
+            (('Allow', 'GET, POST'),
+             ('Accept-Post', 'application/json, text/plain'),
+             ('Accept-Ranges', 'bytes'),
+             ('Link', '<http://example.com/docs>; rel="describedby"')),
+            self.res.response_headers())
+
+    def test_response_headers_empty(self):
+        self.assertEqual((), self.res.response_headers())
+
+        self.res.accept_patch = []
+        self.res.allow = []
+        self.assertEqual((('Allow', ''),), self.res.response_headers())
+
+    def test_response_headers_cached(self):
+        self.res.allow_get = True
+        headers = self.res.response_headers()
+
+        self.assertIs(headers, self.res.response_headers())
+
+        self.res.allow_put = True
+        self.assertEqual((('Allow', 'GET, PUT'),), self.res.response_headers())
+
+        self.res.allow.remove('GET')
+        self.assertEqual((('Allow', 'PUT'),), self.res.response_headers())
+
+        self.res.accept_patch = ['application/merge-patch+json']
+        self.assertEqual((('Allow', 'PUT'),
+                          ('Accept-Patch', 'application/merge-patch+json')),
+                         self.res.response_headers())
+
+        del self.res.hints
+        self.assertEqual((), self.res.response_headers())
+
+    def test_tracked_containers_copy_as_plain(self):
+        self.res.allow.append('GET')
+
+        r = copy.deepcopy(self.res)
+        self.assertIsNot(self.res.hints, r.hints)
+        self.assertIs(r, r.hints._owner)
+        self.assertEqual(self.res, r)
+
+        d = copy.deepcopy(dict(self.res))
+        self.assertIs(dict, type(d['hints']))
+        self.assertIs(list, type(d['hints']['allow']))
@@ -0,0 +1,232 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import gc
+
+import jsonhome
+from jsonhome import revision
+from jsonhome.tests import base
+
+
+def _nodes(rev):
+    """All the trie nodes and buckets that make up a revision."""
+    found = set()
+    pending = [rev._root]
+
+    while pending:
+        entry = pending.pop()
+        found.add(id(entry))
+
+        if type(entry) is revision._Node:
+            pending.extend(e for e in entry.slots if e)
+
+    return found
+
+
+class RevisionTests(base.TestCase):
+
+    def setUp(self):
+        super(RevisionTests, self).setUp()
+        self.doc = jsonhome.Document(base_uri='http://example.com/')
+        self.doc.add_resource('widgets',
+                              uri='/widgets{/widget_id}',
+                              uri_vars={'widget_id': 'param/widget'},
+                              allow_get=True)
+        self.doc.add_resource('gadgets', href='/gadgets')
+        self.rev = revision.Revision(self.doc)
+
+    def test_create_from_document(self):
+        self.assertEqual(2, len(self.rev))
+        self.assertEqual(self.doc, dict(self.rev.items()))
+        self.assertEqual(self.doc.to_dict(), self.rev.to_dict())
+        self.assertEqual(self.doc.to_json(sort_keys=True),
+                         self.rev.to_json(sort_keys=True))
+        self.assertEqual('http://example.com/widgets/1',
+                         self.rev.get_uri('widgets', widget_id=1))
+        self.assertRaises(jsonhome.UnknownResource,
+                          self.rev.get_uri,
+                          'unknown')
+        self.assertIsNone(self.rev.parent)
+        self.assertEqual(0, self.rev.number)
+
+        # the document is still independent
+        self.doc['gadgets'].href = '/other'
+        self.assertEqual('/gadgets', self.rev['gadgets'].href)
+
+    def test_revisions_are_read_only(self):
+        r = self.rev['widgets']
+
+        def _modify_href():
+            r.href = '/other'
+
+        def _modify_hints():
+            r.allow.append('PUT')
+
+        def _set_relation():
+            self.rev['other'] = jsonhome.Resource()
+
+        self.assertRaises(jsonhome.ReadOnly, _modify_href)
+        self.assertRaises(jsonhome.ReadOnly, _modify_hints)
+        self.assertRaises(jsonhome.ReadOnly, r.set_uri, '/other')
+        self.assertRaises(TypeError, _set_relation)
+
+        # reading default values doesn't need to modify the resource
+        self.assertEqual([], self.rev['gadgets'].allow)
+        self.assertEqual({}, self.rev['gadgets'].hints)
+        self.assertEqual(['GET'], r.allow)
+
+    def test_missing_hints_read_only(self):
+        r = self.rev['gadgets']
+
+        def _set_allow():
+            r.allow_put = True
+
+        def _append_allow():
+            r.allow.append('DELETE')
+
+        def _set_hint():
+            r.hints['formats'] = {}
+
+        self.assertRaises(jsonhome.ReadOnly, _set_allow)
+        self.assertRaises(jsonhome.ReadOnly, _append_allow)
+        self.assertRaises(jsonhome.ReadOnly, _set_hint)
+        self.assertEqual({'href': '/gadgets'}, r)
+
+    def test_derive_shares_unchanged_resources(self):
+        draft = self.rev.derive()
+        draft.add_resource('things', href='/things')
+        draft.edit('widgets').allow_put = True
+        new = draft.publish()
+
+        self.assertIs(self.rev, new.parent)
+        self.assertEqual(1, new.number)
+        self.assertEqual(3, len(new))
+        self.assertEqual(2, len(self.rev))
+        self.assertIs(self.rev['gadgets'], new['gadgets'])
+        self.assertIsNot(self.rev['widgets'], new['widgets'])
+        self.assertEqual(['GET'], self.rev['widgets'].allow)
+        self.assertEqual(['GET', 'PUT'], new['widgets'].allow)
+        self.assertNotIn('things', self.rev)
+
+        self.assertRaises(jsonhome.ReadOnly,
+                          setattr, new['things'], 'href', '/other')
+
+    def test_publish_twice(self):
+        draft = self.rev.derive()
+        draft.add_resource('things', href='/things')
+        first = draft.publish()
+
+        draft.add_resource('others', href='/others')
+        second = draft.publish()
+
+        self.assertIs(self.rev, first.parent)
+        self.assertIs(first, second.parent)
+        self.assertEqual(1, first.number)
+        self.assertEqual(2, second.number)
+        self.assertNotIn('others', first)
+        self.assertEqual(4, len(second))
+
+    def test_publish_copies_resources_set_after_edit(self):
+        draft = self.rev.derive()
+        freed = id(draft.edit('widgets'))
+        draft['widgets'] = self.rev['widgets']
+
+        # the edited copy is gone so its id is free to be reused, which is
+        # likely to happen for a resource of the same size.
+        gc.collect()
+
+        resources = [jsonhome.Resource() for i in range(1000)]
+        mine = ([r for r in resources if id(r) == freed] or resources)[0]
+        mine['href'] = '/mine'
+
+        draft['things'] = mine
+        new = draft.publish()
+
+        self.assertFalse(mine._frozen)
+        self.assertIsNot(mine, new['things'])
+        self.assertTrue(new['things']._frozen)
+        self.assertIs(self.rev['widgets'], new['widgets'])
+
+    def test_draft_replace_and_remove(self):
+        r = jsonhome.Resource(href='/replaced')
+
+        draft = self.rev.derive()
+        draft['gadgets'] = r
+        del draft['widgets']
+        self.assertRaises(KeyError, draft.__delitem__, 'widgets')
+        self.assertRaises(jsonhome.ResourceAlreadyExists,
+                          draft.add_resource,
+                          'gadgets')
+        new = draft.publish()
+
+        self.assertEqual(['gadgets'], list(new))
+        self.assertEqual('/replaced', new['gadgets'].href)
+
+        # a resource that wasn't created by the draft is copied so that its
+        # owner can still modify it.
+        self.assertIsNot(r, new['gadgets'])
+        r.href = '/modified'
+        self.assertEqual('/replaced', new['gadgets'].href)
+
+    def test_edit_returns_same_copy(self):
+        draft = self.rev.derive()
+        r = draft.edit('widgets')
+        self.assertIs(r, draft.edit('widgets'))
+        self.assertIsNot(self.rev['widgets'], r)
+
+    def test_to_document(self):
+        doc = self.rev.to_document()
+        self.assertEqual(self.doc, doc)
+        self.assertEqual('http://example.com/', doc.base_uri)
+
+        doc['widgets'].allow_put = True
+        self.assertEqual(['GET'], self.rev['widgets'].allow)
+
+    def test_many_relations(self):
+        draft = revision.Revision().derive()
+        expected = {}
+
+        for i in range(2000):
+            expected['rel/%d' % i] = draft.add_resource('rel/%d' % i,
+                                                        href='/%d' % i)
+
+        for i in range(0, 2000, 3):
+            del draft['rel/%d' % i]
+            del expected['rel/%d' % i]
+
+        rev = draft.publish()
+        self.assertEqual(len(expected), len(rev))
+        self.assertEqual(sorted(expected), sorted(rev))
+
+        for relation, resource in expected.items():
+            self.assertIs(resource, rev[relation])
+
+        self.assertEqual(list(rev), list(revision.Revision(rev).keys()))
+
+    def test_changes_copy_only_path(self):
+        draft = revision.Revision().derive()
+        for i in range(5000):
+            draft.add_resource('rel/%d' % i, href='/%d' % i)
+        rev = draft.publish()
+
+        revisions = [rev]
+        for i in range(20):
+            draft = revisions[-1].derive()
+            draft.edit('rel/%d' % i).href = '/changed'
+            revisions.append(draft.publish())
+
+        for parent, child in zip(revisions, revisions[1:]):
+            new_nodes = _nodes(child) - _nodes(parent)
+            # the root, an interior node and the changed bucket
+            self.assertLessEqual(len(new_nodes), 4)
+            self.assertEqual(1, sum(1 for r in child
+                                    if child[r] is not parent[r]))
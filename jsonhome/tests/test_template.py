@@ -0,0 +1,151 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import itertools
+import random
+
+import uritemplate
+
+from jsonhome import _template
+from jsonhome.tests import base
+
+
+TEMPLATES = [
+    '/widgets',
+    '/100%/widgets{/widget_id}',
+    '/widgets{/widget_id}',
+    '/a/{b}/c{?q}',
+    '{var}',
+    '{var}/{hello}',
+    '{+var}',
+    '{+hello}',
+    '{+path}/here',
+    'here?ref={+path}',
+    'X{#var}',
+    '{#hello}',
+    'map?{x,y}',
+    '{x,hello,y}',
+    '{+x,hello,y}',
+    '{+path,x}/here',
+    '{#x,hello,y}',
+    '{#path,x}/here',
+    'X{.var}',
+    'X{.x,y}',
+    '{/var}',
+    '{/var,x}/here',
+    '{;x,y}',
+    '{;x,y,empty}',
+    '{?x,y}',
+    '{?x,y,empty}',
+    '?fixed=yes{&x}',
+    '{&x,y,empty}',
+    '/{undef}{/undef}{?undef}',
+    '{var}{var}{/var}',
+    '{/list*}',
+    '{?keys*}',
+    '{var:3}',
+    '{var=default}',
+    '{!var}',
+    '/unterminated{var',
+    '{}',
+]
+
+VALUES = [
+    {},
+    {'var': 'value',
+     'hello': 'Hello World!',
+     'path': '/foo/bar',
+     'empty': '',
+     'x': '1024',
+     'y': '768'},
+    {'var': 'café', 'x': 'a/b', 'y': 'c?d#e'},
+    {'var': '%20', 'path': '/a%2Fb', 'hello': '100%', 'x': 'already%25'},
+    {'var': 0, 'x': 0, 'y': 1.5, 'empty': False, 'hello': True},
+    {'var': None, 'x': '', 'y': None, 'b': 'b', 'q': 'a b'},
+    {'widget_id': '1234', 'b': 'bee', 'q': 'query'},
+    {'widget_id': 42, 'q': ''},
+    {'list': ['red', 'green'], 'keys': {'semi': ';', 'dot': '.'},
+     'var': ['a', 'b'], 'x': ('c', 'd')},
+    {'var': {'a': '1', 'b': '2'}, 'x': [('k', 'v')]},
+]
+
+
+def _outcome(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e)
+
+
+class TemplateTests(base.TestCase):
+
+    def test_matches_uritemplate(self):
+        for template, values in itertools.product(TEMPLATES, VALUES):
+            compiled = _template.compile(template)
+
+            self.assertEqual(_outcome(uritemplate.expand, template, values),
+                             _outcome(compiled.expand, values),
+                             'Expanding %r with %r' % (template, values))
+
+    def test_matches_uritemplate_random_values(self):
+        rand = random.Random(1)
+        alphabet = u'aZ09-._~ /?#[]@!$&\'()*+,;=%25\xe9\u20ac'
+        simple = [t for t in TEMPLATES if _template.compile(t).compiled]
+
+        for i in range(500):
+            template = rand.choice(simple)
+            values = dict((n, ''.join(rand.choice(alphabet)
+                                      for j in range(rand.randint(0, 6))))
+                          for n in ('var', 'hello', 'path', 'x', 'y', 'b',
+                                    'q', 'widget_id')
+                          if rand.random() > 0.2)
+
+            self.assertEqual(uritemplate.expand(template, values),
+                             _template.compile(template).expand(values),
+                             'Expanding %r with %r' % (template, values))
+
+    def test_variable_names(self):
+        for template in TEMPLATES:
+            expected = tuple(uritemplate.URITemplate(template).variable_names)
+            self.assertEqual(expected,
+                             _template.compile(template).variable_names)
+
+    def test_simple_templates_compiled(self):
+        for template in ('/widgets',
+                         '/widgets{/widget_id}',
+                         '/a/{b}/c{?q}',
+                         '{+path,x}/here',
+                         '{;x,y,empty}'):
+            self.assertTrue(_template.compile(template).compiled)
+
+    def test_complex_templates_not_compiled(self):
+        for template in ('{/list*}',
+                         '{var:3}',
+                         '{var=default}',
+                         '{!var}'):
+            self.assertFalse(_template.compile(template).compiled)
+
+    def test_compiled_templates_shared(self):
+        self.assertIs(_template.compile('/widgets{/widget_id}'),
+                      _template.compile('/widgets{/widget_id}'))
+
+    def test_least_recently_used_discarded(self):
+        self.patch(_template, '_MAX_CACHED', 2)
+        self.patch(_template, '_compiled', None)
+
+        first = _template.compile('/a{/b}')
+        _template.compile('/c{/d}')
+        self.assertIs(first, _template.compile('/a{/b}'))
+
+        _template.compile('/e{/f}')
+        self.assertEqual(['/a{/b}', '/e{/f}'], list(_template._compiled))
+        self.assertIs(first, _template.compile('/a{/b}'))
@@ -0,0 +1,197 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+import json
+
+import jsonhome
+from jsonhome.tests import base
+
+
+def _public(relation, resource):
+    return not relation.startswith('admin/')
+
+
+class DocumentViewTests(base.TestCase):
+
+    def setUp(self):
+        super(DocumentViewTests, self).setUp()
+        self.doc = jsonhome.Document()
+        self.widgets = self.doc.add_resource('widgets',
+                                             uri='/widgets{/widget_id}',
+                                             uri_vars={'widget_id': 'param'},
+                                             allow_get=True,
+                                             allow_put=True,
+                                             accept_post=['application/json'])
+        self.users = self.doc.add_resource('admin/users',
+                                           href='/users',
+                                           allow_get=True)
+
+    def test_predicate(self):
+        view = self.doc.view(predicate=_public)
+
+        self.assertEqual(['widgets'], list(view))
+        self.assertEqual(1, len(view))
+        self.assertIn('widgets', view)
+        self.assertNotIn('admin/users', view)
+        self.assertEqual(self.widgets, view['widgets'])
+        self.assertRaises(KeyError, lambda: view['admin/users'])
+
+    def test_get_uri(self):
+        view = self.doc.view(predicate=_public)
+
+        self.assertEqual('/widgets/1', view.get_uri('widgets', widget_id=1))
+        self.assertRaises(jsonhome.UnknownResource,
+                          view.get_uri,
+                          'admin/users')
+
+    def test_hint_overrides(self):
+        view = self.doc.view(hints={'widgets': {'allow': ['GET'],
+                                                'accept-post': None}})
+
+        r = view['widgets']
+        self.assertIsNot(self.widgets, r)
+        self.assertEqual(['GET'], r.allow)
+        self.assertFalse(r.allow_put)
+        self.assertEqual({'allow': ['GET']}, r.hints)
+        self.assertEqual('/widgets/1', r.get_uri(widget_id=1))
+        self.assertEqual(self.users, view['admin/users'])
+
+        # the document itself is unchanged
+        self.assertEqual(['GET', 'POST', 'PUT'], self.widgets.allow)
+        self.assertEqual(['application/json'], self.widgets.accept_post)
+
+    def test_hint_overrides_read_only(self):
+        view = self.doc.view(hints={'widgets': {'allow': ['GET']}})
+        r = view['widgets']
+
+        def _set_allow():
+            r.allow_put = True
+
+        def _set_var():
+            r.href_vars['widget_id'] = 'other'
+
+        self.assertRaises(jsonhome.ReadOnly, _set_allow)
+        self.assertRaises(jsonhome.ReadOnly, _set_var)
+        self.assertRaises(jsonhome.ReadOnly, r.allow.append, 'PUT')
+        self.assertRaises(jsonhome.ReadOnly, r.hints.pop, 'allow')
+
+        self.assertEqual(['GET'], view['widgets'].allow)
+        self.assertEqual({'widget_id': 'param'}, self.widgets.href_vars)
+        self.assertIsNot(self.widgets.href_vars, r.href_vars)
+
+    def test_resources_read_only(self):
+        view = self.doc.view(predicate=_public)
+        r = view['widgets']
+
+        def _set_allow():
+            r.allow_delete = True
+
+        self.assertIsNot(self.widgets, r)
+        self.assertIs(r, view['widgets'])
+        self.assertRaises(jsonhome.ReadOnly, _set_allow)
+        self.assertRaises(jsonhome.ReadOnly, r.allow.append, 'DELETE')
+        self.assertEqual(['GET', 'POST', 'PUT'], self.widgets.allow)
+
+        # a copy is only kept until the document changes
+        self.widgets.allow.remove('PUT')
+        self.assertEqual(['GET', 'POST'], view['widgets'].allow)
+        self.assertEqual(['GET', 'POST', 'PUT'], r.allow)
+
+    def test_hint_override_callable(self):
+        def _read_only(relation, resource):
+            return {'allow': ['GET']}
+
+        view = self.doc.view(predicate=_public, hints=_read_only)
+        expected = {'resources': {
+            'widgets': {'href-template': '/widgets{/widget_id}',
+                        'href-vars': {'widget_id': 'param'},
+                        'hints': {'allow': ['GET'],
+                                  'accept-post': ['application/json']}}}}
+
+        self.assertEqual(expected, view.to_dict())
+        self.assertEqual(expected, json.loads(view.to_json()))
+
+    def test_view_follows_document(self):
+        view = self.doc.view(predicate=_public,
+                             hints={'gadgets': {'allow': ['GET']}})
+        self.assertEqual(['widgets'], list(view))
+
+        r = self.doc.add_resource('gadgets', href='/gadgets', allow_put=True)
+        self.assertEqual(['GET'], view['gadgets'].allow)
+
+        r.href = '/things'
+        self.assertEqual('/things', view['gadgets'].href)
+
+        del self.doc['gadgets']
+        self.assertNotIn('gadgets', view)
+
+    def test_json_cached_per_key(self):
+        admin = self.doc.view(key='admin')
+        public = self.doc.view(key='public', predicate=_public)
+
+        admin_json = admin.to_json(sort_keys=True)
+        public_json = public.to_json(sort_keys=True)
+
+        self.assertEqual(self.doc.to_json(sort_keys=True), admin_json)
+        self.assertEqual(['widgets'],
+                         list(json.loads(public_json)['resources']))
+        self.assertEqual(admin_json,
+                         self.doc._view_cache[('admin',
+                                               (('sort_keys', True),))])
+
+        # a new view with the same key is served from the cache
+        self.assertIs(public_json,
+                      self.doc.view(key='public',
+                                    predicate=_public).to_json(sort_keys=True))
+
+    def test_json_cache_invalidated(self):
+        view = self.doc.view(key='public', predicate=_public)
+        view.to_json()
+
+        self.widgets.allow.append('DELETE')
+        self.assertFalse(self.doc._view_cache)
+        self.assertIn('DELETE', view.to_json())
+
+        self.doc.add_resource('gadgets', href='/gadgets')
+        self.assertIn('gadgets', view.to_json())
+
+        self.doc.pop('gadgets')
+        self.assertNotIn('gadgets', view.to_json())
+
+    def test_removed_resource_still_notifies(self):
+        view = self.doc.view(key='public')
+        del self.doc['widgets']
+        view.to_json()
+
+        # changes to a resource that was removed only cause the cache to be
+        # rebuilt unnecessarily.
+        self.widgets.href = '/other'
+        self.assertFalse(self.doc._view_cache)
+
+    def test_resources_notify_once_viewed(self):
+        doc = jsonhome.Document.from_dict(
+            {'resources': {'widgets': {'href': '/widgets'}}})
+        self.assertIsNone(doc['widgets']._documents)
+
+        view = doc.view(key='public')
+        other = jsonhome.Document(base_uri='http://example.com/')
+        other['widgets'] = doc['widgets']
+        other_view = other.view(key='public')
+
+        view.to_json()
+        other_view.to_json()
+        doc['widgets'].href = '/other'
+
+        self.assertFalse(doc._view_cache)
+        self.assertFalse(other._view_cache)
+        self.assertIn('/other', view.to_json())
+        self.assertIn('/other', other_view.to_json())
@@ -0,0 +1,211 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""Filtered views of a json-home document for individual clients."""
+
+import copy
+
+try:
+    from collections import abc as collections_abc
+except ImportError:  # python 2
+    import collections as collections_abc
+
+import jsonhome
+
+
+def _overlay(resource, overrides):
+    """Create a read-only copy of resource with some of its hints replaced.
+
+    The copy shares no containers with the original resource, so neither can
+    be modified through the other.
+    """
+    cls = resource.__class__
+
+    if not issubclass(cls, jsonhome.Resource):
+        cls = jsonhome.Resource
+
+    hints = dict(dict.get(resource, 'hints') or {})
+
+    for name, value in overrides.items():
+        if value is None:
+            hints.pop(name, None)
+        else:
+            hints[name] = value
+
+    overlay = cls()
+
+    for key, value in dict.items(resource):
+        if key != 'hints':
+            dict.__setitem__(overlay, key, jsonhome._track(value, overlay))
+
+    dict.__setitem__(overlay, 'hints', jsonhome._track(hints, overlay))
+    overlay._freeze()
+    return overlay
+
+
+class DocumentView(collections_abc.Mapping):
+    """A read-only view of a Document as it should be seen by one client.
+
+    Hints in a json-home document describe a resource for the client that
+    requested it. A view presents only the relations that are relevant to a
+    client, for example a role or tenant, and can replace the hints on those
+    relations, without copying the document.
+
+    The resources in a view are read-only copies and modifying them raises
+    :py:class:`jsonhome.ReadOnly`, changes must be made to the document. A
+    copy is only made when a resource is fetched from the view and is kept
+    until the document is modified. Serializing the view uses the document's
+    resources directly where there are no overrides.
+
+    :param document: The document that is being viewed.
+    :type document: :py:class:`jsonhome.Document`
+    :param key: A hashable key, such as a role name, that identifies the
+        kind of client. If provided the serialized form of the view is cached
+        on the document under this key until the document is modified. Views
+        created with the same key must use the same predicate and hints.
+    :param callable predicate: Called with a relation and resource, returns
+        True if the relation should be included in the view. If not provided
+        all relations are included.
+    :param hints: Hints to replace on resources in the view. Either a dict of
+        relation to a dict of hints or a callable that is passed a relation
+        and resource and returns a dict of hints or None. A hint value of None
+        removes that hint from the resource.
+    """
+
+    def __init__(self, document, key=None, predicate=None, hints=None):
+        self.document = document
+        document._watch()
+        self.key = key
+        self._predicate = predicate
+        self._hints = hints
+        self._version = None
+        self._sources = {}
+        self._resources = {}
+
+    def _included(self, relation, resource):
+        return self._predicate is None or self._predicate(relation, resource)
+
+    def _source(self, relation):
+        """Fetch the resource that the view presents for a relation.
+
+        Without hint overrides this is the document's own resource, so it
+        must never be handed out.
+
+        :raises KeyError: If the relation isn't in the view.
+        """
+        if self._version != self.document._version:
+            self._sources = {}
+            self._resources = {}
+            self._version = self.document._version
+
+        try:
+            return self._sources[relation]
+        except KeyError:
+            pass
+
+        resource = self.document[relation]
+
+        if not self._included(relation, resource):
+            raise KeyError(relation)
+
+        if callable(self._hints):
+            overrides = self._hints(relation, resource)
+        elif self._hints:
+            overrides = self._hints.get(relation)
+        else:
+            overrides = None
+
+        if overrides:
+            resource = _overlay(resource, overrides)
+
+        self._sources[relation] = resource
+        return resource
+
+    def __getitem__(self, relation):
+        resource = self._source(relation)
+
+        if getattr(resource, '_frozen', False):
+            return resource
+
+        try:
+            return self._resources[relation]
+        except KeyError:
+            resource = self._resources[relation] = _overlay(resource, {})
+            return resource
+
+    def __contains__(self, relation):
+        try:
+            self._source(relation)
+        except KeyError:
+            return False
+
+        return True
+
+    def __iter__(self):
+        for relation, resource in list(self.document.items()):
+            if self._included(relation, resource):
+                yield relation
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def _items(self):
+        return [(relation, self._source(relation)) for relation in self]
+
+    def get_uri(self, relation, **kwargs):
+        """Get the URI for a resource in the view.
+
+        See :py:meth:`jsonhome.Document.get_uri`.
+        """
+        if relation not in self:
+            raise jsonhome.UnknownResource(relation)
+
+        return self.document.get_uri(relation, **kwargs)
+
+    def to_dict(self):
+        """Convert the view into a serializable format.
+
+        :rtype: dict
+        """
+        return {'resources': copy.deepcopy(dict(self._items()))}
+
+    def to_json(self, **kwargs):
+        """Convert the view into JSON format.
+
+        If the view has a key the result is cached on the document until the
+        document is modified.
+
+        :param kwargs: Formatting arguments as accepted by
+            :py:func:`json.dumps`.
+
+        :rtype: str
+        """
+        cache_key = None
+
+        if self.key is not None:
+            try:
+                cache_key = (self.key, tuple(sorted(kwargs.items())))
+                hash(cache_key)
+            except TypeError:
+                cache_key = None
+            else:
+                try:
+                    return self.document._view_cache[cache_key]
+                except KeyError:
+                    pass
+
+        data = jsonhome._dump_resources(self._items(), kwargs)
+
+        if cache_key is not None:
+            self.document._view_cache[cache_key] = data
+
+        return data